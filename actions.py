@@ -2,6 +2,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Optional, Tuple
 
 import color
+import tile_types
 
 # This class needs to know that these objects exist without trying to initialise them
 # Otherwise we get a circle reference
@@ -9,6 +10,9 @@ if TYPE_CHECKING:
     from engine import Engine
     from entity import Entity, Actor
 
+# How far away a fight can be heard
+FIGHT_NOISE_RADIUS = 8
+
 
 class Action:
     def __init__(self, entity: Actor) -> None:
@@ -83,6 +87,9 @@ class MeleeAction(ActionWithDir):
             self.engine.message_log.add_message(
                 f"{attack_description} but does no damage.", attack_color)
 
+        # Fights are loud, anything parked nearby wakes up
+        self.engine.game_map.scheduler.noise(self.entity.x, self.entity.y, FIGHT_NOISE_RADIUS)
+
 
 class MovementAction(ActionWithDir):
 
@@ -95,7 +102,7 @@ class MovementAction(ActionWithDir):
         if not self.engine.game_map.in_bounds(dest_x, dest_y):
             return  # Destination out of bounds
 
-        if not self.engine.game_map.tiles["walkable"][dest_x, dest_y]:
+        if not tile_types.registry.walkable[self.engine.game_map.tiles[dest_x, dest_y]]:
             return  # Destination not walkable
 
         if self.engine.game_map.get_blocking_entity_at(dest_x, dest_y):
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Does making floors in the background slow down the floor being played?
+
+The level generator runs on a thread, so it has to share the GIL with the game loop.
+Plays the same random turns twice, once with nothing in the background and once while
+a LevelPregenerator makes big floors back to back, and compares frame times.
+Also times a floor change made on the spot against one that was ready in time.
+Run from the repository root with `python -m benchmarks.pregen`, optionally with `--turns N`.
+"""
+import argparse
+import random
+import time
+from typing import Optional
+
+import numpy as np  # type:ignore
+
+from engine import Engine
+import entity_factories
+from headless import PHASES, Simulation
+from procgen import LevelPregenerator, generate_dungeon
+
+# (max rooms, room min size, room max size, max monsters per room, map width, map height)
+# Much bigger than a normal floor, so the worker thread is busy the whole time
+FLOOR = (200, 6, 10, 10, 200, 120)
+
+
+def frame_times(turns: int, background: Optional[LevelPregenerator]) -> np.ndarray:
+    """Play turns and return how long each frame took, in milliseconds. Whenever the background
+    floor is done it gets taken and the next one started, so the worker never stops."""
+    sim = Simulation(seed=1)
+    fighter = sim.engine.player.fighter
+    fighter.max_hp = 1_000_000
+    fighter.hp = fighter.max_hp
+
+    if background is not None:
+        background.start()
+    for _ in range(turns):
+        sim.step()
+        if background is not None and background.ready:
+            background.take()
+    return np.sum([sim.timings[phase] for phase in PHASES], axis=0) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=1000, help="Turns to play per run")
+    args = parser.parse_args()
+
+    random.seed(1)
+    background = LevelPregenerator(Engine(player=entity_factories.player.clone()), *FLOOR)
+    results = {"idle": frame_times(args.turns, None), "busy": frame_times(args.turns, background)}
+    background.shutdown()
+
+    print(f"{args.turns} turns, background floors {FLOOR[4]}x{FLOOR[5]}: {background.hits} made while playing")
+    for name, frame_ms in results.items():
+        p50, p95, p99 = np.percentile(frame_ms, [50, 95, 99])
+        print(f"  {name}  frame ms mean {np.mean(frame_ms):.3f}  p50 {p50:.3f}  p95 {p95:.3f}  p99 {p99:.3f}")
+
+    # What a floor change costs the player with and without the head start
+    engine = Engine(player=entity_factories.player.clone())
+    start = time.perf_counter()
+    generate_dungeon(*FLOOR, engine=engine)
+    on_the_spot = time.perf_counter() - start
+
+    pregenerator = LevelPregenerator(engine, *FLOOR)
+    pregenerator.start()
+    while not pregenerator.ready:
+        time.sleep(0.01)
+    start = time.perf_counter()
+    pregenerator.take()
+    handed_over = time.perf_counter() - start
+    pregenerator.shutdown()
+    print(f"floor change: made on the spot {on_the_spot * 1000:.1f} ms, ready in time {handed_over * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
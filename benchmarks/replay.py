@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Journal replay speed and seek time, and a check that replays come out the same.
+
+Plays a journal back headlessly and reports turns/sec for the full replay and how long
+seeking to random turns takes with snapshots. Without a journal it records one first
+from random play. Run from the repository root with `python -m benchmarks.replay [journal]`.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple
+
+from headless import Simulation
+from journal import Journal, JournalHeader, Replay
+
+HEADER = JournalHeader(seed=1, map_width=80, map_height=43, max_rooms=30,
+                       room_min_size=6, room_max_size=10, max_monsters_per_room=2)
+
+
+def fingerprint(sim: Simulation) -> List[Tuple[str, int, int, int]]:
+    """Everything that matters about the entities, to compare two games by."""
+    return sorted((entity.name, entity.x, entity.y, getattr(getattr(entity, "fighter", None), "hp", 0))
+                  for entity in sim.engine.game_map.entities)
+
+
+def record(path: str, turns: int) -> List[Tuple[str, int, int, int]]:
+    """Play random turns with a journal attached, return how the game ended up."""
+    sim = Simulation(map_width=HEADER.map_width, map_height=HEADER.map_height, max_rooms=HEADER.max_rooms,
+                     room_min_size=HEADER.room_min_size, room_max_size=HEADER.room_max_size,
+                     max_monsters_per_room=HEADER.max_monsters_per_room, seed=HEADER.seed)
+    sim.engine.journal = Journal(path, HEADER)
+    sim.run(turns, render=False)
+    sim.engine.journal.close()
+    print(f"recorded {sim.turns} turns to {path} ({os.path.getsize(path)} bytes)")
+    return fingerprint(sim)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("journal", nargs="?", help="Journal to play. Defaults to recording one.")
+    parser.add_argument("--turns", type=int, default=2000, help="Turns to record")
+    parser.add_argument("--snapshot-every", type=int, default=250, help="Turns between snapshots")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        expected = None
+        path = args.journal
+        if path is None:
+            path = os.path.join(directory, "bench.journal")
+            expected = record(path, args.turns)
+
+        replay = Replay(path, snapshot_every=args.snapshot_every,
+                        snapshot_directory=os.path.join(directory, "snapshots"))
+        start = time.perf_counter()
+        sim = replay.seek()
+        elapsed = time.perf_counter() - start
+        print(f"full replay: {sim.turns} turns in {elapsed * 1000:.0f} ms, {sim.turns / elapsed:.0f} turns/s, "
+              f"{len(replay.snapshots)} snapshots")
+        if expected is not None:
+            print(f"same as recorded: {fingerprint(sim) == expected}")
+
+        rng = random.Random(0)
+        seek_times = []
+        for _ in range(20):
+            turn = rng.randrange(replay.turns + 1)
+            start = time.perf_counter()
+            sim = replay.seek(turn)
+            seek_times.append(time.perf_counter() - start)
+        print(f"seek: mean {sum(seek_times) / len(seek_times) * 1000:.1f} ms, max {max(seek_times) * 1000:.1f} ms")
+
+        # Seeking through snapshots has to land on the same game as playing from the start
+        turn = rng.randrange(replay.turns + 1)
+        from_snapshot = fingerprint(replay.seek(turn))
+        from_start = fingerprint(Replay(path, snapshot_every=0).seek(turn))
+        print(f"seek to {turn} matches replay from the start: {from_snapshot == from_start}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Save/load time and file size for a huge level.
+
+Fills a 1000x1000 map with 50k monsters, then saves and loads it with save_game,
+comparing against pickling the same game. Loading isn't free: the map arrays are
+memory-mapped, but every entity still gets built as a Python object, so it takes a few
+hundred milliseconds. Run from the repository root with `python -m benchmarks.save`.
+"""
+import os
+import pickle
+import random
+import tempfile
+import time
+
+import numpy as np  # type:ignore
+
+from engine import Engine
+import entity_factories
+from game_map import GameMap
+from save_game import load_game, save_game
+import tile_types
+
+MONSTERS = 50_000
+MAP_WIDTH, MAP_HEIGHT = 1000, 1000
+
+
+def new_game() -> Engine:
+    random.seed(1)
+    engine = Engine(player=entity_factories.player.clone())
+    engine.game_map = game_map = GameMap(engine, MAP_WIDTH, MAP_HEIGHT)
+    game_map.tiles[1:-1, 1:-1] = tile_types.floor
+    game_map.invalidate_tiles()
+
+    engine.player.place(MAP_WIDTH // 2, MAP_HEIGHT // 2, game_map)
+    # Every monster gets its own tile
+    spots = random.sample(range((MAP_WIDTH - 2) * (MAP_HEIGHT - 2)), MONSTERS)
+    for spot in spots:
+        template = entity_factories.orc if random.random() < 0.8 else entity_factories.troll
+        x, y = 1 + spot % (MAP_WIDTH - 2), 1 + spot // (MAP_WIDTH - 2)
+        if (x, y) != (engine.player.x, engine.player.y):
+            template.spawn(game_map, x, y)
+    engine.update_fov()
+    for i in range(1000):
+        engine.message_log.add_message(f"Message number {i}")
+    return engine
+
+
+def folder_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def main() -> None:
+    engine = new_game()
+    print(f"{MAP_WIDTH}x{MAP_HEIGHT} map, {len(engine.game_map.entities)} entities")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        save_game(engine, directory)
+        saved = time.perf_counter() - start
+
+        start = time.perf_counter()
+        loaded = load_game(directory)
+        load_time = time.perf_counter() - start
+
+        assert len(loaded.game_map.entities) == len(engine.game_map.entities)
+        assert np.array_equal(loaded.game_map.tiles, engine.game_map.tiles)
+        print(f"save_game  save {saved * 1000:8.1f} ms  load {load_time * 1000:8.1f} ms  "
+              f"{folder_size(directory) / 1e6:8.1f} MB")
+
+    # The fov cache and event handler don't need to come along, and the handler can't be pickled anyway
+    engine.fov.clear()
+    state = engine.game_map, engine.player, engine.message_log
+    start = time.perf_counter()
+    data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    saved = time.perf_counter() - start
+    start = time.perf_counter()
+    pickle.loads(data)
+    load_time = time.perf_counter() - start
+    print(f"pickle     save {saved * 1000:8.1f} ms  load {load_time * 1000:8.1f} ms  {len(data) / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
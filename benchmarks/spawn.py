@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Spawn throughput: how fast can we fill a level with monsters?
+
+Compares the old copy.deepcopy spawning to Entity.clone. Entities keep their fields in an
+EntityStore now, so deep-copying one would copy its whole store too. The baseline deep-copies
+a plain object orc instead, laid out the way entities were before the store: the same fields as
+attributes, with a fighter and an AI pointing back at it.
+Each number is the best of a few runs, a single run is at the mercy of when the garbage collector kicks in.
+Run from the repository root with `python -m benchmarks.spawn`.
+"""
+import copy
+import time
+from typing import Callable, List
+
+from engine import Engine
+import entity_factories
+from game_map import GameMap
+from render_order import RenderOrder
+
+MONSTERS = 10_000
+MAP_WIDTH, MAP_HEIGHT = 200, 200
+
+
+class PlainFighter:
+    def __init__(self, hp: int, defense: int, power: int) -> None:
+        self.max_hp = self.hp = hp
+        self.defense = defense
+        self.power = power
+        self.entity = None
+
+
+class PlainAI:
+    def __init__(self, entity: "PlainEntity") -> None:
+        self.entity = entity
+
+
+class PlainEntity:
+    def __init__(self) -> None:
+        orc = entity_factories.orc
+        self.x, self.y = 0, 0
+        self.char, self.color, self.name = orc.char, orc.color, orc.name
+        self.blocks_movement = True
+        self.render_order = RenderOrder.ACTOR
+        self.speed = orc.speed
+        self.ai = PlainAI(self)
+        self.fighter = PlainFighter(orc.fighter.hp, orc.fighter.defense, orc.fighter.power)
+        self.fighter.entity = self
+
+
+plain_orc = PlainEntity()
+
+
+def new_map() -> GameMap:
+    engine = Engine(player=entity_factories.player.clone())
+    return GameMap(engine, MAP_WIDTH, MAP_HEIGHT)
+
+
+def copy_deepcopy(spawned: List[object], x: int, y: int) -> None:
+    """What Entity.spawn used to do to make the copy."""
+    clone = copy.deepcopy(plain_orc)
+    clone.x, clone.y = x, y
+    spawned.append(clone)
+
+
+def copy_clone(spawned: List[object], x: int, y: int) -> None:
+    clone = entity_factories.orc.clone()
+    clone.x, clone.y = x, y
+    spawned.append(clone)
+
+
+def spawn_clone(game_map: GameMap, x: int, y: int) -> None:
+    entity_factories.orc.spawn(game_map, x, y)
+
+
+def measure(spawn: Callable, new_target: Callable[[], object], repeats: int = 3) -> float:
+    """Return entities per second for making MONSTERS monsters, the best of a few runs."""
+    best = 0.0
+    for _ in range(repeats):
+        target = new_target()
+        start = time.perf_counter()
+        for i in range(MONSTERS):
+            spawn(target, i % MAP_WIDTH, i // MAP_WIDTH)
+        best = max(best, MONSTERS / (time.perf_counter() - start))
+    return best
+
+
+def main() -> None:
+    deepcopy = measure(copy_deepcopy, list)
+    clone = measure(copy_clone, list)
+    spawn = measure(spawn_clone, new_map)
+    print(f"Spawning {MONSTERS} monsters")
+    print(f"  copy only, deepcopy: {deepcopy:>10,.0f} entities/sec")
+    print(f"  copy only, clone:    {clone:>10,.0f} entities/sec  ({clone / deepcopy:.1f}x)")
+    print(f"  spawn onto a map:    {spawn:>10,.0f} entities/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Walking across an endless chunked world.
+
+The player heads east through a streaming wilderness while the map slides along behind them.
+Reports turns/sec and how much of the world is in memory, next to what a dense map of the
+ground covered would take. Run from the repository root with `python -m benchmarks.streaming`,
+optionally with `--turns N`.
+"""
+import argparse
+import time
+
+from actions import BumpAction
+from headless import Simulation
+from streaming import CHUNK_SIZE, ChunkStore, StreamingMap, wilderness
+import tile_types
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=2000, help="Turns to play")
+    args = parser.parse_args()
+
+    sim = Simulation(seed=1)
+    engine = sim.engine
+    chunks = ChunkStore(wilderness(seed=1))
+    engine.streaming = streaming = StreamingMap(engine, chunks)
+    engine.game_map = streaming.game_map
+
+    # Start in the middle of world chunk 0,0, on a clear tile, and don't die on the way
+    x, y = streaming.to_local(CHUNK_SIZE // 2, CHUNK_SIZE // 2)
+    streaming.game_map.tiles[x, y] = tile_types.floor
+    streaming.game_map.invalidate_tiles()
+    engine.player.place(x, y, streaming.game_map)
+    fighter = engine.player.fighter
+    fighter.max_hp = 1_000_000
+    fighter.hp = fighter.max_hp
+    engine.update_fov()
+
+    start_x, _ = streaming.to_world(engine.player.x, engine.player.y)
+    start = time.perf_counter()
+    for turn in range(args.turns):
+        # East when possible, otherwise wherever the dice say
+        action = BumpAction(engine.player, 1, 0) if turn % 4 else None
+        sim.step(action)
+    elapsed = time.perf_counter() - start
+    end_x, _ = streaming.to_world(engine.player.x, engine.player.y)
+
+    game_map = streaming.game_map
+    travelled = end_x - start_x
+    dense_bytes = (travelled + game_map.width) * game_map.height * (tile_types.tile_id_dt.itemsize + 2)
+    print(f"{sim.turns} turns  {sim.turns / elapsed:.0f} turns/s  walked {travelled} tiles east, "
+          f"{streaming.shifts} shifts")
+    print(f"chunks: {len(chunks)} in memory ({chunks.resident_bytes / 2**20:.1f}MB), "
+          f"{chunks.generated} generated, {chunks.dropped} dropped, {chunks.loaded} loaded")
+    print(f"GameMap {game_map.width}x{game_map.height} with {len(game_map.entities)} entities, "
+          f"dense map of the same ground {dense_bytes / 2**20:.1f}MB")
+    chunks.close()
+
+
+if __name__ == "__main__":
+    main()
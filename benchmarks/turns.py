@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Turn throughput across map sizes and monster densities.
+
+Plays random turns headlessly and reports turns/sec, frame time percentiles and
+how much of a turn each phase takes. Run from the repository root with
+`python -m benchmarks.turns`, optionally with `--turns N`.
+"""
+import argparse
+import time
+
+import numpy as np  # type:ignore
+
+from headless import PHASES, Simulation
+
+# (map width, map height, max rooms)
+MAP_SIZES = [(80, 43, 30), (200, 120, 200), (400, 240, 800)]
+# Max monsters per room
+DENSITIES = [2, 10, 40]
+
+
+def bench(map_width: int, map_height: int, max_rooms: int, monsters: int, turns: int) -> None:
+    sim = Simulation(map_width=map_width, map_height=map_height, max_rooms=max_rooms,
+                     max_monsters_per_room=monsters, seed=1)
+
+    # The player has to survive the whole run or the numbers aren't comparable
+    fighter = sim.engine.player.fighter
+    fighter.max_hp = 1_000_000
+    fighter.hp = fighter.max_hp
+
+    start = time.perf_counter()
+    played = sim.run(turns)
+    elapsed = time.perf_counter() - start
+
+    frame_ms = np.sum([sim.timings[phase] for phase in PHASES], axis=0) * 1000
+    p50, p95, p99 = np.percentile(frame_ms, [50, 95, 99])
+    phases = "  ".join(f"{phase} {np.mean(sim.timings[phase]) * 1000:.3f}" for phase in PHASES)
+
+    print(f"{map_width:>4}x{map_height:<4} {len(sim.engine.game_map.entities):>6} entities  "
+          f"{played / elapsed:>8.0f} turns/s  "
+          f"frame ms p50 {p50:.3f} p95 {p95:.3f} p99 {p99:.3f}")
+    print(f"{'':>10} mean ms: {phases}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200, help="Turns to play per run")
+    args = parser.parse_args()
+
+    for map_width, map_height, max_rooms in MAP_SIZES:
+        for monsters in DENSITIES:
+            bench(map_width, map_height, max_rooms, monsters, args.turns)
+
+
+if __name__ == "__main__":
+    main()
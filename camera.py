@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+
+class Camera:
+    """The part of the map that's on screen. x,y is the map position of the top left corner of the screen."""
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width, self.height = width, height
+        self.x, self.y = 0, 0
+
+    def center_on(self, x: int, y: int, map_width: int, map_height: int) -> None:
+        """Move so x,y is in the middle of the screen, without showing anything past the edge of the map.
+        If the map is smaller than the screen it just sits in the top left corner."""
+        self.x = max(0, min(x - self.width // 2, map_width - self.width))
+        self.y = max(0, min(y - self.height // 2, map_height - self.height))
+
+    def to_map(self, screen_x: int, screen_y: int) -> Tuple[int, int]:
+        """Turn a position on screen into a position on the map."""
+        return screen_x + self.x, screen_y + self.y
+
+    def to_screen(self, x: int, y: int) -> Tuple[int, int]:
+        """Turn a position on the map into a position on screen. It might not be on the screen."""
+        return x - self.x, y - self.y
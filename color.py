@@ -12,3 +12,5 @@ welcome_text = (0x20, 0xA0, 0xFF)
 bar_text = white
 bar_filled = (0x0, 0x60, 0x0)
 bar_empty = (0x40, 0x10, 0x10)
+
+profiler_text = (0xA0, 0xFF, 0xA0)
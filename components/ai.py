@@ -9,11 +9,14 @@ from actions import *
 from components.base_component import BaseComponent
 
 if TYPE_CHECKING:
+    from engine import Engine
     from entity import Actor
 
 
 class BaseAI(Action, BaseComponent):
     entity: Actor
+    # Chases the player. The engine batches these turns and lets them sleep out of view.
+    hostile = False
 
     def perform(self) -> None:
         raise NotImplementedError()
@@ -22,17 +25,11 @@ class BaseAI(Action, BaseComponent):
         """Compute path to the target position from current position.
         If there's no valid path return an empty list"""
 
-        # Copy the walkable array
-        cost = np.array(self.entity.gamemap.tiles["walkable"], dtype=np.int8)
-
-        for entity in self.entity.gamemap.entities:
-            # Check that an entity blocks movement and the cost isn't zero (blockling)
-            if entity.blocks_movement and cost[entity.x, entity.y]:
-                # Add to the cost of a blocked position.
-                # A lower number means more enemies will crowd behind each other in
-                # hallways.  A higher number means enemies will take longer paths in
-                # order to surround the player.
-                cost[entity.x, entity.y] += 10
+        # The map keeps the cost up to date. Blocking entities cost extra to walk through.
+        # A lower number means more enemies will crowd behind each other in
+        # hallways.  A higher number means enemies will take longer paths in
+        # order to surround the player.
+        cost = self.entity.gamemap.cost
 
         # create a graph from the cost array and pass that graph to a new pathfinder
         graph = tcod.path.SimpleGraph(cost=cost, cardinal=2, diagonal=3)
@@ -54,10 +51,7 @@ class HostileEnemy(BaseAI):
     - If within 1 space of the player, Melee action
     - Otherwise move towards player
     """
-
-    def __init__(self, entity: Actor) -> None:
-        super().__init__(entity)
-        self.path: List[Tuple[int, int]] = []
+    hostile = True
 
     def perform(self) -> None:
         target = self.engine.player
@@ -70,12 +64,55 @@ class HostileEnemy(BaseAI):
             if distance <= 1:
                 return MeleeAction(self.entity, dx, dy).perform()
 
-            # Not close enough to hit
-            self.path = self.get_path_to(target.x, target.y)
+            # Not close enough to hit, so walk down the engine's flow field towards the player
+            step = self.engine.flow_field.step_from(self.entity.x, self.entity.y)
 
-            if self.path:
-                dest_x, dest_y = self.path.pop(0)
+            if step:
+                dest_x, dest_y = step
                 return MovementAction(self.entity, dest_x-self.entity.x, dest_y-self.entity.y,).perform()
 
         # not visible so we wait
         return WaitAction(self.entity).perform()
+
+    @staticmethod
+    def perform_batch(engine: Engine, rows: np.ndarray) -> None:
+        """Take the turn of many HostileEnemy actors at once.
+        Does the same as calling perform on each of them, but decides who waits, attacks and moves
+        with array maths over the map's store. Only the actors that end up moving or attacking get
+        looked up as objects. Moves are worked out from where everyone stood at the start of the
+        turn, and if two monsters want the same tile only the first one gets it.
+
+        Args:
+            engine (Engine): The engine the actors belong to
+            rows (np.ndarray): Rows in the map's store of actors with HostileEnemy AI, in turn order
+        """
+        game_map = engine.game_map
+        store = game_map.store
+        rows = rows[store.alive[rows]]
+        if not len(rows):
+            return
+
+        target = engine.player
+        xs, ys = store.x[rows], store.y[rows]
+
+        # Monsters the player can't see just wait, which costs nothing
+        visible = game_map.visible[xs, ys]
+        distance = np.maximum(np.abs(target.x - xs), np.abs(target.y - ys))  # Chebyshev distance
+        attackers = np.flatnonzero(visible & (distance <= 1))
+        walkers = np.flatnonzero(visible & (distance > 1))
+
+        if len(walkers):
+            engine.flow_field.update(game_map, target.x, target.y)
+            step_xs, step_ys, has_step = engine.flow_field.steps_from(xs[walkers], ys[walkers])
+            walkers, step_xs, step_ys = walkers[has_step], step_xs[has_step], step_ys[has_step]
+
+            # First come, first served when more than one walker picked the same tile
+            _, first = np.unique(step_xs * game_map.height + step_ys, return_index=True)
+            for i in np.sort(first):
+                game_map.move_entity(store.entities[rows[walkers[i]]], int(step_xs[i]), int(step_ys[i]))
+
+        # Attacks go one at a time because each one can kill the player and logs a message
+        for row in rows[attackers]:
+            if store.alive[row]:
+                actor = store.entities[row]
+                MeleeAction(actor, target.x - actor.x, target.y - actor.y).perform()
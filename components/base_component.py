@@ -9,6 +9,8 @@ if TYPE_CHECKING:
 
 
 class BaseComponent:
+    __slots__ = ("entity",)
+
     entity: Entity  # Who it belongs to
 
     @property
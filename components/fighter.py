@@ -11,21 +11,62 @@ if TYPE_CHECKING:
 
 
 class Fighter(BaseComponent):
+    """Combat stats of an actor. They live in the actor's row of its EntityStore,
+    this just reads and writes them."""
+    __slots__ = ("_stats",)
+
     entity: Actor
 
     def __init__(self, hp: int, defense: int, power: int) -> None:
-        self.max_hp = hp
-        self._hp = hp
-        self.defense = defense
-        self.power = power
+        # Held until the fighter joins an actor (see attach), then they move into its row
+        self._stats = (hp, defense, power)
+
+    def attach(self, entity: Actor) -> None:
+        """Make this fighter the one of an actor, with the stats it was made with."""
+        self.entity = entity
+        hp, defense, power = self._stats
+        store, row = entity._store, entity._row
+        store.hp[row] = store.max_hp[row] = hp
+        store.defense[row], store.power[row] = defense, power
+
+    @classmethod
+    def view(cls, entity: Actor) -> Fighter:
+        """Return a fighter for an actor whose row already has its stats, e.g. a clone."""
+        fighter = cls.__new__(cls)
+        fighter.entity = entity
+        return fighter
+
+    @property
+    def max_hp(self) -> int:
+        return int(self.entity._store.max_hp[self.entity._row])
+
+    @max_hp.setter
+    def max_hp(self, value: int) -> None:
+        self.entity._store.max_hp[self.entity._row] = value
+
+    @property
+    def defense(self) -> int:
+        return int(self.entity._store.defense[self.entity._row])
+
+    @defense.setter
+    def defense(self, value: int) -> None:
+        self.entity._store.defense[self.entity._row] = value
+
+    @property
+    def power(self) -> int:
+        return int(self.entity._store.power[self.entity._row])
+
+    @power.setter
+    def power(self, value: int) -> None:
+        self.entity._store.power[self.entity._row] = value
 
     @property
     def hp(self) -> int:
-        return self._hp
+        return int(self.entity._store.hp[self.entity._row])
 
     @hp.setter
     def hp(self, value: int) -> None:
-        self._hp = max(0, min(value, self.max_hp))
+        self.entity._store.hp[self.entity._row] = max(0, min(value, self.max_hp))
         if self.hp == 0 and self.entity.ai:
             self.die()
 
@@ -42,6 +83,7 @@ class Fighter(BaseComponent):
         self.entity.color = (191, 0, 0)
         self.entity.blocks_movement = False
         self.entity.ai = None
+        self.entity.gamemap.scheduler.remove(self.entity)
         self.entity.name = f"Remains of {self.entity.name}"
         self.entity.render_order = RenderOrder.CORPSE
 
@@ -0,0 +1,153 @@
+"""Drawing a frame as a stack of layers that get merged onto the console in one go.
+
+Every layer is a console-sized graphic_dt array (see tile_types) plus a mask of which parts of
+which cells something was drawn on. Layers have the bits of the Console API that the render
+functions use (print, draw_rect, width, height), so those can draw on a layer or a console.
+Composing goes bottom to top and only ever does a handful of whole-array copies, no matter how
+many strings and entities got drawn.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np  # type:ignore
+from tcod.console import Console
+
+from tile_types import graphic_dt
+
+# Which parts of a cell a layer drew on. Anything it didn't draw shows the layer below.
+CH, FG, BG = 1, 2, 4
+
+# What a cell looks like with nothing on it, same as a cleared console
+BLANK = np.array((ord(" "), (255, 255, 255), (0, 0, 0)), dtype=graphic_dt)
+
+
+def _part_bytes() -> np.ndarray:
+    # For every combination of CH, FG and BG, which bytes of a graphic_dt cell that is
+    table = np.zeros((8, graphic_dt.itemsize), dtype=bool)
+    for part, field in ((CH, "ch"), (FG, "fg"), (BG, "bg")):
+        dtype, offset = graphic_dt.fields[field][:2]
+        for drawn in range(8):
+            if drawn & part:
+                table[drawn, offset:offset + dtype.itemsize] = True
+    return table
+
+
+# Indexed with a layer's `drawn`, gives the mask to copy it with byte by byte
+PART_BYTES = _part_bytes()
+
+
+def _raw(tiles: np.ndarray) -> np.ndarray:
+    # A graphic_dt array as a width x height x itemsize array of bytes, without copying
+    return tiles.view(np.uint8).reshape(*tiles.shape, graphic_dt.itemsize)
+
+
+@lru_cache(maxsize=1024)
+def glyphs(text: str) -> np.ndarray:
+    """Codepoints of a string. Cached, because mostly the same HUD text gets drawn every frame.
+
+    Returns:
+        np.ndarray: Read only int32 array, one codepoint per character
+    """
+    codes = np.fromiter(map(ord, text), dtype=np.int32, count=len(text))
+    codes.flags.writeable = False
+    return codes
+
+
+class Layer:
+    """One layer of a frame. Starts out see-through, see clear."""
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width, self.height = width, height
+        self.tiles_rgb = np.full((width, height), BLANK, dtype=graphic_dt)
+        # The same memory as raw bytes, see Compositor.compose
+        self.raw = _raw(self.tiles_rgb)
+        # CH | FG | BG for what got drawn on each cell
+        self.drawn = np.zeros((width, height), dtype=np.uint8)
+
+    def clear(self) -> None:
+        """Make the whole layer see-through again."""
+        self.drawn[...] = 0
+
+    def blit(self, x: int, y: int, tiles: np.ndarray) -> None:
+        """Draw a block of graphic_dt tiles with its top left corner at x,y. Hides everything below."""
+        cells = slice(x, x + tiles.shape[0]), slice(y, y + tiles.shape[1])
+        self.tiles_rgb[cells] = tiles
+        self.drawn[cells] = CH | FG | BG
+
+    def put(self, xs: np.ndarray, ys: np.ndarray, ch: np.ndarray, fg: np.ndarray) -> None:
+        """Draw a lot of glyphs at once, e.g. entities. The background of the layer below stays."""
+        self.tiles_rgb["ch"][xs, ys] = ch
+        self.tiles_rgb["fg"][xs, ys] = fg
+        self.drawn[xs, ys] |= CH | FG
+
+    def print(self, x: int, y: int, string: str, fg: Optional[Tuple[int, int, int]] = None,
+              bg: Optional[Tuple[int, int, int]] = None) -> None:
+        """Like Console.print, for one left aligned line. Whatever doesn't fit gets cut off.
+
+        Args:
+            fg (Tuple[int, int, int], optional): Text color. Defaults to the color below.
+            bg (Tuple[int, int, int], optional): Background color. Defaults to the color below.
+        """
+        codes = glyphs(string)
+        start, end = max(0, -x), min(len(codes), self.width - x)
+        if not 0 <= y < self.height or start >= end:
+            return
+        cells = slice(x + start, x + end), y
+        self.tiles_rgb["ch"][cells] = codes[start:end]
+        self.drawn[cells] |= CH
+        self._color(cells, fg, bg)
+
+    def draw_rect(self, x: int, y: int, width: int, height: int, ch: int,
+                  fg: Optional[Tuple[int, int, int]] = None, bg: Optional[Tuple[int, int, int]] = None) -> None:
+        """Like Console.draw_rect. A ch of 0, or a color of None, leaves what's below alone."""
+        cells = slice(max(0, x), max(0, x + width)), slice(max(0, y), max(0, y + height))
+        if ch:
+            self.tiles_rgb["ch"][cells] = ch
+            self.drawn[cells] |= CH
+        self._color(cells, fg, bg)
+
+    def _color(self, cells: Tuple[slice, object], fg: Optional[Tuple[int, int, int]],
+               bg: Optional[Tuple[int, int, int]]) -> None:
+        if fg is not None:
+            self.tiles_rgb["fg"][cells] = fg
+            self.drawn[cells] |= FG
+        if bg is not None:
+            self.tiles_rgb["bg"][cells] = bg
+            self.drawn[cells] |= BG
+
+
+class Compositor:
+    """The layers of a frame, bottom to top: map, entities, hud, overlay."""
+
+    def __init__(self) -> None:
+        self.width = self.height = 0
+        self.map = self.entities = self.hud = self.overlay = Layer(0, 0)
+        self._frame = np.empty((0, 0), dtype=graphic_dt)
+        self._blank = _raw(self._frame)
+
+    @property
+    def layers(self) -> List[Layer]:
+        return [self.map, self.entities, self.hud, self.overlay]
+
+    def begin(self, width: int, height: int) -> None:
+        """Start a new frame, with every layer see-through. The layers get made again if the console changed size."""
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.map, self.entities, self.hud, self.overlay = (Layer(width, height) for _ in range(4))
+            self._frame = np.empty((width, height), dtype=graphic_dt)
+            self._blank = _raw(np.full((width, height), BLANK, dtype=graphic_dt))
+        for layer in self.layers:
+            layer.clear()
+
+    def compose(self, console: Console) -> None:
+        """Merge the layers onto a console (made with order="F") the same size as the frame."""
+        # Copying structured arrays field by field is slow, so the merging is done on the raw bytes
+        frame = _raw(self._frame)
+        frame[...] = self._blank
+        for layer in self.layers:
+            if not layer.drawn.any():
+                continue
+            np.copyto(frame, layer.raw, where=PART_BYTES.take(layer.drawn, axis=0))
+        console.tiles_rgb[...] = self._frame
@@ -1,59 +1,227 @@
 from __future__ import annotations
 from config import Config
-from render_functions import render_bar, render_names_at_mouse
+from render_functions import render_bar, render_names_at_mouse, render_profiler_overlay
 from message_log import MessageLog
-from typing import Tuple, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
 
+import numpy as np  # type:ignore
+
+from camera import Camera
+from compositor import Compositor
+from components.ai import HostileEnemy
+from flow_field import FlowField
+from fov import FovCache
 from game_map import GameMap
+from profiler import Profiler
+from scheduler import action_time
+from world import World
 
 from tcod.console import Console
-from tcod.map import compute_fov
 
 
-from input_handlers import EventHandler, MainGameEventHandler
+from input_handlers import EventHandler, FrameLimiter, MainGameEventHandler
 
 if TYPE_CHECKING:
     from entity import Actor
+    from journal import Journal
     from game_map import GameMap
+    from procgen import LevelPregenerator
+    from streaming import StreamingMap
 
 
 class Engine:
     """go brrrrrr"""
     game_map: GameMap
+    # Makes new floors, see next_floor
+    level_generator: LevelPregenerator
 
-    def __init__(self, player: Actor) -> None:
+    def __init__(self, player: Actor, viewport_width: int = 80, viewport_height: int = 43) -> None:
+        """
+        Args:
+            player (Actor): The player
+            viewport_width (int, optional): Width of the part of the screen the map gets. Defaults to 80.
+            viewport_height (int, optional): Height of the part of the screen the map gets, the UI has the rest.
+                Defaults to 43.
+        """
         self.config = Config()
-        self.event_handler: EventHandler = MainGameEventHandler(self)
+        # Times every phase of the game loop
+        self.profiler = Profiler()
+        # Set whenever something on screen changed, so the main loop knows to draw a new frame
+        self.needs_render = True
+        self.event_handler = MainGameEventHandler(self)
         self.message_log = MessageLog()
         self.mouse_location: Tuple[int, int] = 0, 0
+        # Input: wait for events (False), or check for them every frame at up to frame_limiter.max_fps (True)
+        self.poll_input = False
+        self.frame_limiter = FrameLimiter(max_fps=60)
+        # Most repeats of a held key to act on per frame, None for all of them
+        self.max_key_repeats: Optional[int] = 1
         self.player = player
+        # Shared by every monster walking towards the player.
+        # Monsters keep walking to where the player was until they've moved more than a step away
+        self.flow_field = FlowField(replan_distance=1)
+        # Resolve all HostileEnemy turns in one go with array maths instead of one at a time
+        self.batch_enemy_turns = True
+        # TODO: Magic number: Visible radius
+        self.fov = FovCache(radius=8)
+        # Monsters the player can't see sleep (cost nothing per turn) unless they're this close to the player
+        self.activity_radius = 0
+        # Which part of the map is on screen
+        self.camera = Camera(width=viewport_width, height=viewport_height)
+        # Everything gets drawn on these first, see render
+        self.layers = Compositor()
+        # Records every player action, when set
+        self.journal: Optional[Journal] = None
+        # Set when playing an endless chunked world instead of dungeon floors
+        self.streaming: Optional[StreamingMap] = None
+        # Every floor visited so far. Only the last few stay in memory, the rest wait on disk.
+        self.world = World(self)
+
+    @property
+    def event_handler(self) -> EventHandler:
+        return self._event_handler
+
+    @event_handler.setter
+    def event_handler(self, value: EventHandler) -> None:
+        # A new handler usually draws something different (history, game over, etc.)
+        self._event_handler = value
+        self.needs_render = True
+
+    def next_floor(self) -> None:
+        """Move the player to a new floor. It's been generated in the background if it could."""
+        self.world.leave()
+        self.game_map = self.level_generator.take()
+        self.flow_field.clear()
+        self.world.add(self.game_map)
+        self.update_fov()
+        self.needs_render = True
+
+    def go_to_floor(self, depth: int) -> None:
+        """Move the player back to a floor they've already been on."""
+        self.game_map = self.world.enter(depth)
+        self.flow_field.clear()
+        self.update_fov()
+        self.needs_render = True
 
     def handle_enemy_turns(self) -> None:
-        # All entities in list except player
-        for entity in set(self.game_map.actors) - {self.player}:
-            if entity.ai:
-                entity.ai.perform()
+        """Let everyone whose turn came up while the player acted take it.
+        Monsters with nothing to do (see inactive) get parked until update_activity or a fight wakes them,
+        so they cost nothing."""
+        scheduler = self.game_map.scheduler
+        store = self.game_map.store
+        # The player's action took this long, everyone else catches up to it
+        scheduler.advance(action_time(self.player))
+
+        # Whether the flow field has been brought up to date this turn
+        chasing = False
+        # Fast actors can be due more than once, so keep going until nobody is
+        while True:
+            due = scheduler.pop_due()
+            if not due:
+                break
+
+            # Who's alive and who chases the player comes straight from the store
+            rows = np.fromiter((actor.row for _, actor in due), dtype=np.intp, count=len(due))
+            alive, hostile = store.alive[rows], store.hostile[rows]
+            batched = hostile if self.batch_enemy_turns else np.zeros_like(hostile)
+
+            one_by_one = alive & ~batched
+            if not chasing and (hostile & one_by_one).any():
+                # At most one pathfinding pass per turn, no matter how many monsters are chasing.
+                # The player doesn't move during enemy turns, so it stays good for the whole turn.
+                self.flow_field.update(self.game_map, self.player.x, self.player.y)
+                chasing = True
+            for i in np.flatnonzero(one_by_one):
+                actor = due[i][1]
+                # Whoever went before might have killed it
+                if not actor.is_alive:
+                    continue
+                with self.profiler.phase(f"ai.{type(actor.ai).__name__}"):
+                    actor.ai.perform()
+            if batched.any():
+                with self.profiler.phase("ai.HostileEnemy"):
+                    HostileEnemy.perform_batch(self, rows[alive & batched])
+
+            # Anyone who ended their turn out of the way goes to sleep right away, everyone else goes again later.
+            # Only monsters that are still alive and chasing can sleep.
+            hostile = store.hostile[rows]
+            asleep = np.zeros(len(due), dtype=bool)
+            asleep[hostile] = self.inactive(rows[hostile])
+            for (time, actor), sleeps in zip(due, asleep.tolist()):
+                # It might have died, or left the map
+                if not actor.is_alive or actor.gamemap is not self.game_map:
+                    continue
+                if sleeps:
+                    scheduler.park(actor)
+                else:
+                    scheduler.schedule(actor, time + action_time(actor))
+        self.profiler.gauge("ai.dormant", len(scheduler.dormant))
 
     def update_fov(self) -> None:
         """Recompute the visible area based on the player's point of view.
+        Nothing gets computed if the player didn't move and the map didn't change.
+        On a streaming map, this is also when it slides over to keep up with the player.
         """
+        if self.streaming is not None:
+            self.streaming.update(self.player.x, self.player.y)
+        if self.fov.update(self.game_map, self.player.x, self.player.y):
+            self.game_map.invalidate_fov()
+            self.update_activity()
 
-        # TODO: Magic number: Visible radius
-        self.game_map.visible[:] = compute_fov(
-            self.game_map.tiles["transparent"], (self.player.x, self.player.y), radius=8)
+    def inactive(self, rows: np.ndarray) -> np.ndarray:
+        """Which of these actors have nothing to do: the player can't see them, they're
+        further than activity_radius away, and no noise is keeping them up (see Scheduler.kept_awake).
 
-        # If it's in that result, it needs to be added to "explored"
-        self.game_map.explored |= self.game_map.visible
+        Args:
+            rows (np.ndarray): Rows of the actors in the map's store
+
+        Returns:
+            np.ndarray: One bool per row, True for the ones that can sleep
+        """
+        store = self.game_map.store
+        xs, ys = store.x[rows], store.y[rows]
+        distance = np.maximum(np.abs(xs - self.player.x), np.abs(ys - self.player.y))  # Chebyshev distance
+        return (~self.game_map.visible[xs, ys] & (distance > self.activity_radius)
+                & ~self.game_map.scheduler.kept_awake(rows))
+
+    def update_activity(self) -> None:
+        """Wake monsters that came into view or range and put the ones that went out of it to sleep,
+        so enemy turns only ever go to monsters that can do something."""
+        scheduler = self.game_map.scheduler
+        scheduler.wake_in(self.game_map.visible)
+        if self.activity_radius > 0:
+            scheduler.wake_near(self.player.x, self.player.y, self.activity_radius)
+        awake = scheduler.awake()
+        rows = np.fromiter((actor.row for actor in awake), dtype=np.intp, count=len(awake))
+        asleep = self.game_map.store.hostile[rows]
+        asleep[asleep] = self.inactive(rows[asleep])
+        for i in np.flatnonzero(asleep):
+            scheduler.park(awake[i])
 
     def render(self, console: Console) -> None:
+        """Draw the frame: map, entities, HUD and overlay each on their own layer, then all merged onto the console at once."""
+        profiler = self.profiler
+        layers = self.layers
+        layers.begin(console.width, console.height)
+
         # Draw map
-        self.game_map.render(console)
+        with profiler.phase("map"):
+            self.camera.center_on(self.player.x, self.player.y, self.game_map.width, self.game_map.height)
+            self.game_map.render(layers.map, layers.entities, self.camera)
 
         # Draw User Interface
-        render_bar(console=console, current_val=self.player.fighter.hp,
-                   max_val=self.player.fighter.max_hp, total_width=20,)
+        with profiler.phase("hud"):
+            render_bar(console=layers.hud, current_val=self.player.fighter.hp,
+                       max_val=self.player.fighter.max_hp, total_width=20,)
 
-        render_names_at_mouse(console=console, x=21, y=44, engine=self)
+            render_names_at_mouse(console=layers.hud, x=21, y=44, engine=self)
 
         # Draw message log
-        self.message_log.render(console, x=21, y=45, width=40, height=5)
+        with profiler.phase("message_log"):
+            self.message_log.render(layers.hud, x=21, y=45, width=40, height=5)
+
+        if profiler.show_overlay:
+            render_profiler_overlay(console=layers.overlay, engine=self)
+
+        with profiler.phase("compose"):
+            layers.compose(console)
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-import copy
 from typing import Tuple, TypeVar, Type, Optional, TYPE_CHECKING
 
+from entity_store import EntityStore, unplaced
 from render_order import RenderOrder
 
 if TYPE_CHECKING:
@@ -14,11 +14,19 @@ T = TypeVar("T", bound="Entity")
 
 
 class Entity:
-    """Generic object to represent players, enemies, items, etc. """
+    """Generic object to represent players, enemies, items, etc.
+
+    Apart from the name, every field lives in a row of an EntityStore (the map's, or
+    entity_store.unplaced when it isn't on one). The attributes read and write that row.
+    """
+
+    # No per-instance __dict__, so big levels can hold a lot more of these
+    __slots__ = ("gamemap", "name", "_store", "_row")
 
     gamemap: GameMap
 
     def __init__(self, gamemap: Optional[GameMap] = None, x: int = 0, y: int = 0, char: str = "?", color: Tuple[int, int, int] = (255, 255, 255), name: str = "<Unnamed>", blocks_movement: bool = False, render_order: RenderOrder = RenderOrder.CORPSE,) -> None:
+        unplaced.allocate(self)
         self.x = x
         self.y = y
         self.char = char
@@ -30,7 +38,78 @@ class Entity:
         # gamemap is options
         if gamemap:
             self.gamemap = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
+
+    def __del__(self) -> None:
+        # Give the row back. Entities on a map are held by its store, so this only
+        # happens to ones that aren't on a map (or whose map is going away too).
+        store = getattr(self, "_store", None)
+        if store is not None:
+            store.forget(self._row)
+
+    @property
+    def row(self) -> int:
+        """Where this entity's fields are in its store's columns, e.g. `gamemap.store.hp[actor.row]`."""
+        return self._row
+
+    @property
+    def x(self) -> int:
+        return int(self._store.x[self._row])
+
+    @x.setter
+    def x(self, value: int) -> None:
+        # On a map, moving has to go through the map so its spatial index keeps up
+        if self._store.gamemap is not None:
+            self._store.gamemap.move_entity(self, value, self.y)
+        else:
+            self._store.x[self._row] = value
+
+    @property
+    def y(self) -> int:
+        return int(self._store.y[self._row])
+
+    @y.setter
+    def y(self, value: int) -> None:
+        if self._store.gamemap is not None:
+            self._store.gamemap.move_entity(self, self.x, value)
+        else:
+            self._store.y[self._row] = value
+
+    @property
+    def char(self) -> str:
+        return chr(self._store.ch[self._row])
+
+    @char.setter
+    def char(self, value: str) -> None:
+        self._store.ch[self._row] = ord(value)
+
+    @property
+    def color(self) -> Tuple[int, int, int]:
+        return tuple(self._store.fg[self._row].tolist())  # type: ignore
+
+    @color.setter
+    def color(self, value: Tuple[int, int, int]) -> None:
+        self._store.fg[self._row] = value
+
+    @property
+    def blocks_movement(self) -> bool:
+        return bool(self._store.blocks_movement[self._row])
+
+    @blocks_movement.setter
+    def blocks_movement(self, value: bool) -> None:
+        # The map counts blockers on every tile
+        if self._store.gamemap is not None:
+            self._store.gamemap.set_blocks_movement(self, value)
+        else:
+            self._store.blocks_movement[self._row] = value
+
+    @property
+    def render_order(self) -> RenderOrder:
+        return RenderOrder(self._store.render_order[self._row])
+
+    @render_order.setter
+    def render_order(self, value: RenderOrder) -> None:
+        self._store.set_render_order(self, value.value)
 
     def spawn(self: T, gamemap: GameMap, x: int, y: int) -> T:
         """Spawn a copy of this instance at the given location.
@@ -43,10 +122,28 @@ class Entity:
         Returns:
             T: Reference to new entity, already added to map
         """
-        clone = copy.deepcopy(self)
-        clone.x, clone.y = x, y
+        # Made right in the map's store, so nothing else gets touched (maps can be made on another thread)
+        clone = self.clone(gamemap.store)
+        gamemap.store.move(clone, x, y)
         clone.gamemap = gamemap
-        gamemap.entities.add(clone)
+        gamemap.add_entity(clone)
+        return clone
+
+    def clone(self: T, store: Optional[EntityStore] = None) -> T:
+        """Make a new entity from this one, used as a template.
+        Subclasses that add components must override this to build fresh ones.
+
+        Args:
+            store (EntityStore, optional): Store the copy gets its row in. Defaults to unplaced,
+                i.e. the copy isn't on any map.
+
+        Returns:
+            T: The new entity
+        """
+        # Skip __init__, the row gets copied straight over. The name is immutable so sharing is fine.
+        clone = object.__new__(type(self))
+        (unplaced if store is None else store).copy(self, clone)
+        clone.name = self.name
         return clone
 
     def place(self, x: int, y: int, gamemap: Optional[GameMap] = None) -> None:
@@ -57,13 +154,19 @@ class Entity:
             y (int): Vertical position
             gamemap (GameMap, optional): Reference to the game map. Defaults to None.
         """
-        self.x, self.y = x, y
         if gamemap:
             # check whether the entity already has a gamemap that it belongs to
             if hasattr(self, "gamemap"):
-                self.gamemap.entities.remove(self)
+                self.gamemap.remove_entity(self)
+            # The entity might have been handed to the new map's constructor already
+            gamemap.remove_entity(self)
+            self.x, self.y = x, y
             self.gamemap = gamemap
-            gamemap.entities.add(self)
+            gamemap.add_entity(self)
+        elif hasattr(self, "gamemap"):
+            self.gamemap.move_entity(self, x, y)
+        else:
+            self.x, self.y = x, y
 
     def move(self, dx: int, dy: int) -> Tuple[int, int]:
         """Move entity by given amount
@@ -74,23 +177,60 @@ class Entity:
 
         Returns Tuple[int,int]: New position x,y
         """
-        self.x += dx
-        self.y += dy
+        if hasattr(self, "gamemap"):
+            self.gamemap.move_entity(self, self.x + dx, self.y + dy)
+        else:
+            self.x += dx
+            self.y += dy
 
         return dx, dy
 
 
 class Actor(Entity):
-    def __init__(self, *, x: int = 0, y: int = 0, char: str = "?", color: Tuple[int, int, int] = (255, 255, 255), name: str = "<Unnamed>", ai_cls: Type[BaseAI], fighter: Fighter) -> None:
+    __slots__ = ("_ai", "fighter")
+
+    def __init__(self, *, x: int = 0, y: int = 0, char: str = "?", color: Tuple[int, int, int] = (255, 255, 255), name: str = "<Unnamed>", ai_cls: Type[BaseAI], fighter: Fighter, speed: int = 100) -> None:
         super().__init__(x=x, y=y, char=char, color=color, name=name,
                          blocks_movement=True, render_order=RenderOrder.ACTOR)
 
+        # 100 is normal, 200 gets twice as many turns, 50 half as many
+        self.speed = speed
+
         self.ai: Optional[BaseAI] = ai_cls(self)
 
         self.fighter = fighter
-        self.fighter.entity = self
+        fighter.attach(self)
+
+    def clone(self, store: Optional[EntityStore] = None) -> Actor:
+        clone = super().clone(store)
+        # The stats came along with the row, the fighter only needs to point at it
+        clone.fighter = self.fighter.view(clone)
+        # The AI gets built from scratch, the same way the constructor does it
+        clone.ai = type(self.ai)(clone) if self.ai else None
+        return clone
+
+    @property
+    def speed(self) -> int:
+        return int(self._store.speed[self._row])
+
+    @speed.setter
+    def speed(self, value: int) -> None:
+        if value < 1:
+            raise ValueError(f"Speed has to be at least 1, got {value}")
+        self._store.speed[self._row] = value
+
+    @property
+    def ai(self) -> Optional[BaseAI]:
+        return self._ai
+
+    @ai.setter
+    def ai(self, value: Optional[BaseAI]) -> None:
+        self._ai = value
+        # The store's alive and hostile columns are what bulk queries about living actors go by
+        self._store.alive[self._row] = bool(value)
+        self._store.hostile[self._row] = value is not None and value.hostile
 
     @property
     def is_alive(self) -> bool:
         """Returns Trie as long as this actor can perform actions."""
-        return bool(self.ai)
+        return bool(self._ai)
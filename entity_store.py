@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import gc
+from typing import Dict, Iterator, List, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+
+from render_order import RenderOrder
+
+if TYPE_CHECKING:
+    from entity import Actor, Entity
+    from game_map import GameMap
+
+# Every column the store keeps, with its type
+COLUMNS = {
+    "x": np.int32,
+    "y": np.int32,
+    "hp": np.int32,
+    "max_hp": np.int32,
+    "power": np.int32,
+    "defense": np.int32,
+    "speed": np.int32,
+    "blocks_movement": np.bool_,
+    "render_order": np.uint8,
+    "ch": np.int32,  # Unicode codepoint of the entity's char
+    "fg": np.dtype("3B"),  # RGB of the entity's color
+    "alive": np.bool_,  # True for actors that still have an AI
+    "hostile": np.bool_,  # True for actors whose AI chases the player, see BaseAI.hostile
+    "awake_until": np.int64,  # Scheduler time until which the actor can't be parked, see Scheduler.wake
+    "in_use": np.bool_,  # False for rows that are free to be handed out again
+}
+
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    """Keep the garbage collector out of the way while making a lot of entities in one go.
+
+    Every few hundred new objects Python goes looking for reference cycles, and the more there
+    already are the longer that takes. For tens of thousands of entities (each with a fighter and
+    an AI pointing back at it) that's most of the time spent. Nothing made in here is garbage yet,
+    so the collector can wait until the end.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _objects(entities: Sequence[Entity]) -> np.ndarray:
+    # An object array of the entities. Assigning the list straight to one is a lot slower,
+    # NumPy checks every element for whether it's a sequence of its own.
+    return np.fromiter(entities, dtype=object, count=len(entities))
+
+
+class EntityStore:
+    """Struct-of-arrays storage for entities.
+
+    Each entity gets a row, and each field gets a NumPy column. This is the only place the
+    fields live: Entity, Actor and Fighter attributes read and write their row, so there's
+    nothing to keep in sync. Questions like "which living actors are in FOV" are a mask over
+    a few arrays instead of a loop over the entities.
+
+    Every entity has a row in exactly one store: the one of the map it's on, or `unplaced`
+    when it isn't on a map. Moving to another map moves the row along with it.
+    """
+
+    def __init__(self, capacity: int = 64, gamemap: Optional[GameMap] = None) -> None:
+        """
+        Args:
+            capacity (int, optional): Rows to start with, it grows when they run out. Defaults to 64.
+            gamemap (GameMap, optional): Map the store belongs to. Defaults to None, for `unplaced`.
+        """
+        self.gamemap = gamemap
+        self.capacity = capacity
+        self.x = np.zeros(capacity, dtype=COLUMNS["x"])
+        self.y = np.zeros(capacity, dtype=COLUMNS["y"])
+        self.hp = np.zeros(capacity, dtype=COLUMNS["hp"])
+        self.max_hp = np.zeros(capacity, dtype=COLUMNS["max_hp"])
+        self.power = np.zeros(capacity, dtype=COLUMNS["power"])
+        self.defense = np.zeros(capacity, dtype=COLUMNS["defense"])
+        self.speed = np.zeros(capacity, dtype=COLUMNS["speed"])
+        self.blocks_movement = np.zeros(capacity, dtype=COLUMNS["blocks_movement"])
+        self.render_order = np.zeros(capacity, dtype=COLUMNS["render_order"])
+        self.ch = np.zeros(capacity, dtype=COLUMNS["ch"])
+        self.fg = np.zeros(capacity, dtype=COLUMNS["fg"])
+        self.alive = np.zeros(capacity, dtype=COLUMNS["alive"])
+        self.hostile = np.zeros(capacity, dtype=COLUMNS["hostile"])
+        self.awake_until = np.zeros(capacity, dtype=COLUMNS["awake_until"])
+        self.in_use = np.zeros(capacity, dtype=COLUMNS["in_use"])
+        # Every column in COLUMNS order, for copying whole rows without looking each one up by name
+        self._columns = [getattr(self, name) for name in COLUMNS]
+
+        # Entity that owns each row. Only a map's store keeps these, so entities
+        # that aren't on a map can still be garbage collected.
+        self.entities = np.empty(capacity, dtype=object)
+        self._free: List[int] = []
+        self.size = 0  # Rows handed out so far. Everything past this is untouched.
+
+        # Rows grouped by render order, only rebuilt when entities come, go or change order
+        self._render_buckets: Optional[List[np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.in_use[:self.size]))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes taken up by the columns."""
+        return sum(getattr(self, name).nbytes for name in COLUMNS) + self.entities.nbytes
+
+    def _grow(self, needed: int) -> None:
+        while self.capacity < needed:
+            self.capacity *= 2
+        for name in COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros((self.capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+        self._columns = [getattr(self, name) for name in COLUMNS]
+        entities = np.empty(self.capacity, dtype=object)
+        entities[:self.size] = self.entities[:self.size]
+        self.entities = entities
+
+    def _new_row(self, entity: Entity) -> int:
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self.size == self.capacity:
+                self._grow(self.size + 1)
+            row = self.size
+            self.size += 1
+        self.in_use[row] = True
+        if self.gamemap is not None:
+            self.entities[row] = entity
+        entity._store, entity._row = self, row
+        return row
+
+    def _new_rows(self, count: int) -> np.ndarray:
+        # Same as _new_row for a lot of entities: free rows first, then new ones off the end
+        reused = min(count, len(self._free))
+        rows = np.empty(count, dtype=np.intp)
+        if reused:
+            rows[:reused] = self._free[-reused:]
+            del self._free[-reused:]
+        fresh = count - reused
+        if self.size + fresh > self.capacity:
+            self._grow(self.size + fresh)
+        rows[reused:] = np.arange(self.size, self.size + fresh)
+        self.size += fresh
+        self.in_use[rows] = True
+        return rows
+
+    def allocate(self, entity: Entity) -> None:
+        """Give a new entity a row of its own, with every field zeroed."""
+        row = self._new_row(entity)
+        for name in COLUMNS:
+            if name != "in_use":
+                getattr(self, name)[row] = 0
+        self._render_buckets = None
+
+    def copy(self, source: Entity, entity: Entity) -> None:
+        """Give a new entity a row that's a copy of another entity's, see Entity.clone."""
+        store, source_row = source._store, source._row
+        row = self._new_row(entity)
+        for column, source_column in zip(self._columns, store._columns):
+            column[row] = source_column[source_row]
+        self._render_buckets = None
+
+    def take(self, entity: Entity) -> None:
+        """Move an entity's row here from whatever store it's in now. Does nothing if it's already here."""
+        store, source_row = entity._store, entity._row
+        if store is self:
+            return
+        row = self._new_row(entity)
+        for column, source_column in zip(self._columns, store._columns):
+            column[row] = source_column[source_row]
+        store.free(source_row)
+        self._render_buckets = None
+
+    def take_many(self, entities: Sequence[Entity]) -> np.ndarray:
+        """Move a lot of entities' rows here at once. Much faster than take one at a time
+        when they all come from the same store, e.g. a save that was just read.
+
+        Returns:
+            np.ndarray: Their rows here, in the same order
+        """
+        if not entities:
+            return np.zeros(0, dtype=np.intp)
+        source = entities[0]._store
+        if source is self or any(entity._store is not source for entity in entities):
+            for entity in entities:
+                self.take(entity)
+            return np.fromiter((entity._row for entity in entities), dtype=np.intp, count=len(entities))
+
+        source_rows = np.fromiter((entity._row for entity in entities), dtype=np.intp, count=len(entities))
+        rows = self._new_rows(len(entities))
+        for name in COLUMNS:
+            if name != "in_use":
+                getattr(self, name)[rows] = getattr(source, name)[source_rows]
+        if self.gamemap is not None:
+            self.entities[rows] = _objects(entities)
+        for row, entity in zip(rows.tolist(), entities):
+            entity._store, entity._row = self, row
+        source.free_many(source_rows)
+        self._render_buckets = None
+        return rows
+
+    def extend(self, entities: Sequence[Entity], columns: Dict[str, np.ndarray]) -> None:
+        """Give a lot of new entities rows at once, filled in from columns, e.g. from a save.
+
+        Args:
+            entities (Sequence[Entity]): Entities that don't have a row yet
+            columns (Dict[str, np.ndarray]): A value for each entity in every column except "in_use".
+                Columns that are missing get zeroed.
+        """
+        rows = self._new_rows(len(entities))
+        for name in COLUMNS:
+            if name != "in_use":
+                getattr(self, name)[rows] = columns.get(name, 0)
+        if self.gamemap is not None:
+            self.entities[rows] = _objects(entities)
+        for row, entity in zip(rows.tolist(), entities):
+            entity._store, entity._row = self, row
+        self._render_buckets = None
+
+    def free(self, row: int) -> None:
+        """Hand a row back, once its entity has moved somewhere else."""
+        self.entities[row] = None
+        self.in_use[row] = False
+        self.alive[row] = False
+        self.hostile[row] = False
+        self.blocks_movement[row] = False
+        self._free.append(row)
+        self._render_buckets = None
+
+    def free_many(self, rows: np.ndarray) -> None:
+        self.entities[rows] = None
+        self.in_use[rows] = False
+        self.alive[rows] = False
+        self.hostile[rows] = False
+        self.blocks_movement[rows] = False
+        self._free.extend(rows.tolist())
+        self._render_buckets = None
+
+    def forget(self, row: int) -> None:
+        """Hand back the row of an entity that's being garbage collected.
+        Can happen at any time, so it does as little as possible."""
+        self.in_use[row] = False
+        self._free.append(row)
+
+    def move(self, entity: Entity, x: int, y: int) -> None:
+        """Write an entity's position. On a map, use GameMap.move_entity (or just set x and y) instead."""
+        row = entity._row
+        self.x[row], self.y[row] = x, y
+
+    def set_blocks_movement(self, entity: Entity, blocks_movement: bool) -> None:
+        """Write whether an entity blocks movement. On a map, use GameMap.set_blocks_movement instead."""
+        self.blocks_movement[entity._row] = blocks_movement
+
+    def set_render_order(self, entity: Entity, render_order: int) -> None:
+        row = entity._row
+        if self.render_order[row] != render_order:
+            self.render_order[row] = render_order
+            self._render_buckets = None
+
+    def living_rows(self) -> np.ndarray:
+        """Rows of every actor that is still alive."""
+        return np.flatnonzero(self.alive[:self.size])
+
+    def living_actors_in(self, mask: np.ndarray) -> List[Actor]:
+        """Return the living actors standing on a True tile of a map-sized mask, e.g. `visible`."""
+        rows = self.living_rows()
+        rows = rows[mask[self.x[rows], self.y[rows]]]
+        return list(self.entities[rows])
+
+    def render_buckets(self) -> List[np.ndarray]:
+        """Return the rows in use, grouped by render order from the bottom layer to the top."""
+        if self._render_buckets is None:
+            in_use = self.in_use[:self.size]
+            render_order = self.render_order[:self.size]
+            self._render_buckets = [np.flatnonzero(in_use & (render_order == order.value))
+                                    for order in sorted(RenderOrder, key=lambda x: x.value)]
+        return self._render_buckets
+
+
+# Where entities that aren't on any map keep their fields, e.g. the templates in entity_factories
+unplaced = EntityStore()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+import tcod
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+
+# Neighbouring cells a walker can step to, as dx,dy
+NEIGHBOURS = np.array([(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)])
+
+
+class FlowField:
+    """Dijkstra distance map rooted at a single target (usually the player).
+
+    Anything walking towards the target can share one of these and just step downhill,
+    instead of every walker running its own pathfinder.
+    The field is reused between turns until the target wanders more than `replan_distance`
+    away from the root, the map's tiles change, or walkers get stuck behind each other.
+    """
+
+    def __init__(self, replan_distance: int = 0) -> None:
+        self.distance: Optional[np.ndarray] = None
+        self.root: Tuple[int, int] = (0, 0)
+        self.replan_distance = replan_distance
+
+        # How often update() could reuse the field (hits) or had to run the pathfinder (misses)
+        self.hits = 0
+        self.misses = 0
+
+        self._gamemap: Optional[GameMap] = None
+        self._tiles_version = -1
+        self._stale = True
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of updates that didn't need the pathfinder."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def stale(self) -> bool:
+        """True if the next update is going to recompute the field whatever happens."""
+        return self._stale
+
+    def invalidate(self) -> None:
+        """Force the next update to recompute the field."""
+        self._stale = True
+
+    def clear(self) -> None:
+        """Forget the field and the map it was for, e.g. when the player changes floors.
+        Otherwise the old floor stays in memory until the next update, even once it's been evicted."""
+        self.distance = None
+        self._gamemap = None
+        self._stale = True
+
+    def update(self, gamemap: GameMap, root_x: int, root_y: int) -> None:
+        """Make sure the field leads to root_x, root_y, recomputing it only if needed.
+
+        Args:
+            gamemap (GameMap): Map the field is for
+            root_x (int): Horizontal position of the target
+            root_y (int): Vertical position of the target
+        """
+        if (not self._stale
+                and gamemap is self._gamemap
+                and gamemap.tiles_version == self._tiles_version
+                and max(abs(root_x - self.root[0]), abs(root_y - self.root[1])) <= self.replan_distance):
+            self.hits += 1
+            return
+
+        self.misses += 1
+        self.compute(gamemap, root_x, root_y)
+
+    def compute(self, gamemap: GameMap, root_x: int, root_y: int) -> None:
+        """Compute the distance from every cell on the map to the root.
+
+        Args:
+            gamemap (GameMap): Map to compute the distances on
+            root_x (int): Horizontal position of the target
+            root_y (int): Vertical position of the target
+        """
+
+        # Same crowd cost as BaseAI.get_path_to so monsters still try to surround the player
+        graph = tcod.path.SimpleGraph(cost=gamemap.cost, cardinal=2, diagonal=3)
+        pathfinder = tcod.path.Pathfinder(graph)
+        pathfinder.add_root((root_x, root_y))
+        pathfinder.resolve()  # No goal means the whole map gets filled in
+
+        self.distance = pathfinder.distance
+        self.root = root_x, root_y
+        self._gamemap = gamemap
+        self._tiles_version = gamemap.tiles_version
+        self._stale = False
+
+    def restore(self, gamemap: GameMap, distance: Optional[np.ndarray], root: Tuple[int, int], stale: bool) -> None:
+        """Put back a field from an earlier copy of the game (e.g. a replay snapshot), as if it
+        had been computed on gamemap. Otherwise walkers could go a different way than they did."""
+        self.distance = distance
+        self.root = root
+        self._gamemap = gamemap
+        self._tiles_version = gamemap.tiles_version
+        self._stale = stale
+
+    def step_from(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """Return the free neighbouring cell that is closest to the root.
+
+        Args:
+            x (int): Horizontal position to step from
+            y (int): Vertical position to step from
+
+        Returns:
+            Optional[Tuple[int, int]]: x,y of the next step, or None if there's no way closer
+        """
+        if self.distance is None or self._gamemap is None:
+            return None
+
+        # Only look at the 3x3 window around x,y, clipped to the edges of the map
+        left, top = max(x - 1, 0), max(y - 1, 0)
+        window = self.distance[left:x + 2, top:y + 2]
+        here = self.distance[x, y]
+
+        # Try the neighbours from most to least downhill
+        for index in np.argsort(window, axis=None):
+            step_x, step_y = np.unravel_index(index, window.shape)
+            if window[step_x, step_y] >= here:
+                break  # Nothing downhill left, which includes unreachable cells
+            step_x, step_y = int(step_x) + left, int(step_y) + top
+            if not self._gamemap.get_blocking_entity_at(step_x, step_y):
+                return step_x, step_y
+
+        if window.min() < here:
+            # There was a way closer but something is standing in it now. The crowd has moved
+            # since the field was computed, so plan around them next turn.
+            self._stale = True
+        return None
+
+    def steps_from(self, xs: np.ndarray, ys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorised step_from for a whole batch of walkers.
+        Every walker looks at the map as it was before any of them moved.
+
+        Args:
+            xs (np.ndarray): Horizontal positions to step from
+            ys (np.ndarray): Vertical positions to step from
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: x and y of each walker's next step,
+                and a mask of which walkers have a step at all
+        """
+        if self.distance is None or self._gamemap is None:
+            return xs, ys, np.zeros(len(xs), dtype=bool)
+
+        width, height = self.distance.shape
+        unreachable = np.iinfo(self.distance.dtype).max
+
+        # One row per walker, one column per neighbour
+        step_xs = xs[:, np.newaxis] + NEIGHBOURS[:, 0]
+        step_ys = ys[:, np.newaxis] + NEIGHBOURS[:, 1]
+        inside = (0 <= step_xs) & (step_xs < width) & (0 <= step_ys) & (step_ys < height)
+        np.clip(step_xs, 0, width - 1, out=step_xs)
+        np.clip(step_ys, 0, height - 1, out=step_ys)
+
+        values = np.where(inside, self.distance[step_xs, step_ys], unreachable)
+        downhill = values < self.distance[xs, ys][:, np.newaxis]
+        free = downhill & (self._gamemap.blockers[step_xs, step_ys] == 0)
+
+        best = np.argmin(np.where(free, values, unreachable), axis=1)
+        rows = np.arange(len(xs))
+        has_step = free[rows, best]
+
+        if (downhill.any(axis=1) & ~has_step).any():
+            # Same as step_from: someone is stuck behind the crowd, so plan around them next turn
+            self._stale = True
+
+        return step_xs[rows, best], step_ys[rows, best], has_step
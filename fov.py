@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Optional, Tuple, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+from tcod.map import compute_fov
+
+import tile_types
+
+if TYPE_CHECKING:
+    from game_map import GameMap
+
+# A window into the map, as the slices to index it with
+Window = Tuple[slice, slice]
+
+
+class FovCache:
+    """Works out what the player can see, doing as little work as possible.
+
+    - If neither the player nor the tiles changed since last time, nothing happens.
+    - Only the square around the player that the radius can reach gets computed.
+    - The last `max_size` results are kept (least recently used goes first), keyed by
+      position and tile version, so walking back down a corridor doesn't compute anything.
+    """
+
+    def __init__(self, radius: int = 8, max_size: int = 256) -> None:
+        self.radius = radius
+        self.max_size = max_size
+
+        # Lookups that were already cached (hits) or needed compute_fov (misses)
+        self.hits = 0
+        self.misses = 0
+
+        self._cache: OrderedDict[Tuple[int, int, int], Tuple[Window, np.ndarray]] = OrderedDict()
+        self._gamemap: Optional[GameMap] = None
+        self._last_key: Optional[Tuple[int, int, int]] = None
+        self._last_window: Optional[Window] = None
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that came out of the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self) -> None:
+        """Forget everything, so the next update computes from scratch."""
+        self._cache.clear()
+        self._gamemap = None
+        self._last_key = None
+        self._last_window = None
+
+    def update(self, gamemap: GameMap, x: int, y: int) -> bool:
+        """Update the map's `visible` and `explored` arrays for a viewer at x,y.
+
+        Args:
+            gamemap (GameMap): Map to update
+            x (int): Horizontal position of the viewer
+            y (int): Vertical position of the viewer
+
+        Returns:
+            bool: True if anything was changed
+        """
+        if gamemap is not self._gamemap:
+            # Different map, nothing we've got is any use
+            self.clear()
+            self._gamemap = gamemap
+
+        key = x, y, gamemap.tiles_version
+        if key == self._last_key:
+            return False
+
+        cached = self._cache.get(key)
+        if cached:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            window, in_view = cached
+        else:
+            self.misses += 1
+            window, in_view = self._compute(gamemap, x, y)
+            self._cache[key] = window, in_view
+            if len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+        # Only the old and new windows can have changed
+        if self._last_window:
+            gamemap.visible[self._last_window] = False
+        else:
+            gamemap.visible[:] = False
+        gamemap.visible[window] = in_view
+        # If it's in that result, it needs to be added to "explored"
+        gamemap.explored[window] |= in_view
+
+        self._last_key = key
+        self._last_window = window
+        return True
+
+    def _compute(self, gamemap: GameMap, x: int, y: int) -> Tuple[Window, np.ndarray]:
+        # Nothing past the radius can be seen, so only the square around x,y matters
+        left, top = max(x - self.radius, 0), max(y - self.radius, 0)
+        window = slice(left, x + self.radius + 1), slice(top, y + self.radius + 1)
+        in_view = compute_fov(tile_types.registry.transparent[gamemap.tiles[window]], (x - left, y - top), radius=self.radius)
+        return window, in_view
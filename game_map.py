@@ -1,40 +1,196 @@
 from __future__ import annotations
 
-from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+from typing import AbstractSet, Dict, Iterable, Iterator, Optional, Sequence, Set, Tuple, TYPE_CHECKING
 
 import numpy as np
 from numpy.lib.arraysetops import isin  # type: ignore
-from tcod.console import Console
 
 from entity import Actor
+from entity_store import EntityStore, paused_gc, unplaced
+from scheduler import Scheduler
 import tile_types
 
 if TYPE_CHECKING:
+    from camera import Camera
+    from compositor import Layer
     from engine import Engine
     from entity import Entity
 
 
+_NO_ENTITIES: AbstractSet[Entity] = frozenset()
+
+# Rough size of one entity with its components, on top of its store row
+ENTITY_BYTES = 600
+
+
 class GameMap:
-    def __init__(self, engine: Engine, width: int, height: int, entities: Iterable[Entity] = ()) -> None:
+    def __init__(self, engine: Engine, width: int, height: int, entities: Iterable[Entity] = (),
+                 tiles: Optional[np.ndarray] = None) -> None:
         self.engine = engine
         self.width, self.height = width, height
-        self.entities = set(entities)
 
-        # Make map full of floor
-        self.tiles = np.full(
-            (width, height), fill_value=tile_types.wall, order="F")
+        # Tile ID of every tile, see tile_types.registry for what they are.
+        # Full of walls, unless we're handed the tiles (e.g. memory-mapped from a save)
+        if tiles is None:
+            tiles = np.full((width, height), fill_value=tile_types.wall, dtype=tile_types.tile_id_dt, order="F")
+        self.tiles = tiles
 
         # Tiles the player can see now
         self.visible = np.full((width, height), fill_value=False, order="F")
         # Tiles the player has seen before
         self.explored = np.full((width, height), fill_value=False, order="F")
+        # Goes up every time visible or explored change
+        self.fov_version = 0
+
+        # The map part of the last frame, only the bit on screen.
+        # Redrawn only when tiles or FOV change or the camera moves.
+        self._map_layer = np.full((0, 0), fill_value=tile_types.SHROUD, order="F")
+        self._map_layer_key: Tuple[int, ...] = ()
+
+        # Number of movement blocking entities on each tile
+        self._blockers = np.zeros((width, height), dtype=np.int16, order="F")
+        # Pathfinding cost, built from the tiles and kept up to date as blockers come and go
+        self._cost = np.zeros((width, height), dtype=np.int16, order="F")
+        self._cost_dirty = True
+        # Goes up every time the tiles change, so caches can tell when they're out of date
+        self.tiles_version = 0
+
+        self.entities: Set[Entity] = set()
+        # Where the entities' fields live while they're on this map, as columns for bulk queries
+        self.store = EntityStore(gamemap=self)
+        # Spatial index of every entity on the map, keyed by (x, y)
+        self._entity_index: Dict[Tuple[int, int], Set[Entity]] = {}
+        # When each actor gets its next turn
+        self.scheduler = Scheduler(self)
+        for entity in entities:
+            self.add_entity(entity)
 
     @property
     def actors(self) -> Iterator[Actor]:
         """Iterate over this map's libing actors."""
-        yield from (entity
-                    for entity in self.entities
-                    if isinstance(entity, Actor) and entity.is_alive)
+        entities = self.store.entities
+        for row in self.store.living_rows():
+            actor = entities[row]
+            # Something earlier in the loop might have killed it
+            if actor.is_alive:
+                yield actor
+
+    @property
+    def nbytes(self) -> int:
+        """Rough number of bytes this map takes up in memory, entities included."""
+        arrays = (self.tiles, self.visible, self.explored, self._map_layer, self._blockers, self._cost)
+        return sum(array.nbytes for array in arrays) + self.store.nbytes + len(self.store) * ENTITY_BYTES
+
+    @property
+    def cost(self) -> np.ndarray:
+        """Pathfinding cost of every tile. 0 can't be walked on, 1 is open floor, and each
+        blocking entity adds 10 so walkers try to go around each other.
+        The array is shared, so don't modify it."""
+        if self._cost_dirty:
+            # Tiles changed, so start over from the walkable array. Blockers are already counted.
+            self._cost[:] = np.where(tile_types.registry.walkable[self.tiles], 1 + 10 * self._blockers, 0)
+            self._cost_dirty = False
+        return self._cost
+
+    @property
+    def blockers(self) -> np.ndarray:
+        """Number of movement blocking entities on each tile. Don't modify it."""
+        return self._blockers
+
+    def invalidate_tiles(self) -> None:
+        """Call after changing tiles, so anything derived from them gets rebuilt."""
+        self._cost_dirty = True
+        self.tiles_version += 1
+
+    def invalidate_fov(self) -> None:
+        """Call after changing `visible` or `explored`, so the map gets redrawn."""
+        self.fov_version += 1
+
+    def _add_blocker(self, x: int, y: int, amount: int) -> None:
+        self._blockers[x, y] += amount
+        if not self._cost_dirty and self._cost[x, y]:
+            self._cost[x, y] += 10 * amount
+
+    def add_entity(self, entity: Entity) -> None:
+        """Add an entity to this map at its current position."""
+        self.entities.add(entity)
+        self.store.take(entity)
+        self._entity_index.setdefault((entity.x, entity.y), set()).add(entity)
+        if entity.blocks_movement:
+            self._add_blocker(entity.x, entity.y, 1)
+        if self._takes_turns(entity):
+            self.scheduler.add(entity)
+
+    def _takes_turns(self, entity: Entity) -> bool:
+        # The player's turns come from the keyboard, everyone else's from the scheduler
+        return isinstance(entity, Actor) and entity.is_alive and entity is not self.engine.player
+
+    def add_entities(self, entities: Sequence[Entity], schedule: bool = True) -> None:
+        """Add a lot of new entities in one go, much faster than add_entity one at a time.
+
+        Args:
+            entities (Sequence[Entity]): Entities that aren't on the map yet, at their current positions
+            schedule (bool, optional): Give the actors their first turn right away. Turn it off when
+                the timeline gets put back some other way (e.g. from a save). Defaults to True.
+        """
+        self.entities.update(entities)
+        store = self.store
+        rows = store.take_many(entities)
+        xs, ys = store.x[rows], store.y[rows]
+        with paused_gc():
+            for entity, x, y in zip(entities, xs.tolist(), ys.tolist()):
+                self._entity_index.setdefault((x, y), set()).add(entity)
+        blocks = store.blocks_movement[rows]
+        np.add.at(self._blockers, (xs[blocks], ys[blocks]), 1)
+        self._cost_dirty = True
+        if schedule:
+            self.scheduler.add_many([entity for entity in entities if self._takes_turns(entity)])
+
+    def remove_entity(self, entity: Entity) -> None:
+        """Remove an entity from this map. Does nothing if it isn't on the map."""
+        if entity not in self.entities:
+            return
+        self.entities.remove(entity)
+        self._unindex(entity)
+        if entity.blocks_movement:
+            self._add_blocker(entity.x, entity.y, -1)
+        if isinstance(entity, Actor):
+            self.scheduler.remove(entity)
+        # Its fields go with it
+        unplaced.take(entity)
+
+    def move_entity(self, entity: Entity, x: int, y: int) -> None:
+        """Change the position of an entity on this map and keep the spatial index in sync.
+
+        Args:
+            entity (Entity): Entity that is already on this map
+            x (int): New horizontal position
+            y (int): New vertical position
+        """
+        self._unindex(entity)
+        if entity.blocks_movement:
+            self._add_blocker(entity.x, entity.y, -1)
+            self._add_blocker(x, y, 1)
+        self.store.move(entity, x, y)
+        self._entity_index.setdefault((x, y), set()).add(entity)
+
+    def set_blocks_movement(self, entity: Entity, blocks_movement: bool) -> None:
+        """Change whether an entity on this map blocks movement, e.g. when it dies."""
+        if entity.blocks_movement != blocks_movement:
+            self._add_blocker(entity.x, entity.y, 1 if blocks_movement else -1)
+        self.store.set_blocks_movement(entity, blocks_movement)
+
+    def _unindex(self, entity: Entity) -> None:
+        key = (entity.x, entity.y)
+        bucket = self._entity_index[key]
+        bucket.discard(entity)
+        if not bucket:
+            # Don't let empty cells pile up in the index
+            del self._entity_index[key]
+
+    def get_entities_at(self, loc_x: int, loc_y: int) -> AbstractSet[Entity]:
+        """Return the entities at a location. The result must not be modified."""
+        return self._entity_index.get((loc_x, loc_y), _NO_ENTITIES)
 
     def in_bounds(self, x: int, y: int) -> bool:
         """Return True if x and y are inside the bounds of the map.
@@ -50,38 +206,56 @@ class GameMap:
         return 0 <= x < self.width and 0 <= y < self.height
 
     def get_blocking_entity_at(self, loc_x: int, loc_y: int) -> Optional[Entity]:
-        for entity in self.entities:
-            if entity.blocks_movement and entity.x == loc_x and entity.y == loc_y:
+        for entity in self.get_entities_at(loc_x, loc_y):
+            if entity.blocks_movement:
                 return entity
 
         # If we're here, it means we didn't find anything blocking
         return None
 
     def get_actor_at(self, loc_x: int, loc_y: int) -> Optional[Actor]:
-        for actor in self.actors:
-            if actor.x == loc_x and actor.y == loc_y:
-                return actor
+        for entity in self.get_entities_at(loc_x, loc_y):
+            if isinstance(entity, Actor) and entity.is_alive:
+                return entity
 
         # If we're here, it means we didn't find any actor
         return None
 
-    def render(self, console: Console) -> None:
+    def render(self, map_layer: Layer, entity_layer: Layer, camera: Optional[Camera] = None) -> None:
         """Render the map
         If a tile is in the "visible" array, then draw it with the "light" colors.
         If it isn't, but it's in the "explored" array, then draw it with the "dark" colors.
         Otherwise, the default is "SHROUD".
+
+        Args:
+            map_layer (Layer): Layer to draw the tiles on
+            entity_layer (Layer): Layer to draw the entities on
+            camera (Camera, optional): Only draw the part of the map it's looking at.
+                Defaults to None, which draws the whole map in the top left corner.
         """
-        # Draw walls
-        console.tiles_rgb[0:self.width, 0:self.height] = np.select(condlist=[self.visible, self.explored], choicelist=[
-                                                                   self.tiles["light"], self.tiles["dark"]], default=tile_types.SHROUD,)
-
-        # Sort entities in render order
-
-        entities_sorted = sorted(
-            self.entities, key=lambda x: x.render_order.value)
-        # Draw entities
-        for entity in entities_sorted:
-            #console.print(entity.x, entity.y, entity.char, fg=entity.color)
-            # Only print entities that are in the FOV
-            if self.visible[entity.x, entity.y]:
-                console.print(entity.x, entity.y, entity.char, fg=entity.color)
+        if camera is None:
+            left, top, width, height = 0, 0, self.width, self.height
+        else:
+            left, top = camera.x, camera.y
+            width, height = min(camera.width, self.width - left), min(camera.height, self.height - top)
+        view = slice(left, left + width), slice(top, top + height)
+
+        # Draw walls, but only work them out again if tiles or FOV changed or the camera moved since last time
+        key = self.tiles_version, self.fov_version, left, top, width, height
+        if key != self._map_layer_key:
+            lighting = np.where(self.visible[view], tile_types.LIGHT,
+                                np.where(self.explored[view], tile_types.DARK, tile_types.SHROUDED))
+            self._map_layer = tile_types.registry.graphics[lighting, self.tiles[view]]
+            self._map_layer_key = key
+        map_layer.blit(0, 0, self._map_layer)
+
+        # Draw entities that are in the FOV, one render order at a time so actors go over corpses.
+        # Entities only change buckets when they're added, removed or die, so nothing gets sorted here.
+        store = self.store
+        for rows in store.render_buckets():
+            xs, ys = store.x[rows], store.y[rows]
+            shown = self.visible[xs, ys]
+            if camera is not None:
+                shown &= (xs >= left) & (xs < left + width) & (ys >= top) & (ys < top + height)
+            rows, xs, ys = rows[shown], xs[shown] - left, ys[shown] - top
+            entity_layer.put(xs, ys, store.ch[rows], store.fg[rows])
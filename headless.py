@@ -0,0 +1,123 @@
+"""Run the game without a window, for benchmarks, soak tests and replays."""
+from __future__ import annotations
+
+import random
+from typing import Dict, Iterable, List, Optional
+
+import tcod
+
+from actions import Action, BumpAction, WaitAction
+from engine import Engine
+import entity_factories
+from procgen import generate_dungeon
+from profiler import Profiler
+
+# Everything a turn is split into, in the order it happens
+PHASES = ("player", "ai", "fov", "map", "hud", "message_log", "compose")
+
+DIRECTIONS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+class Simulation:
+    """A game with no window. Feed it actions (or let it make random ones) and it plays
+    them the same way MainGameEventHandler does, drawing into an offscreen console.
+    The engine's profiler keeps every sample, so `timings` has how long each phase of every turn took.
+    """
+
+    def __init__(self, *, map_width: int = 80, map_height: int = 43, max_rooms: int = 30,
+                 room_min_size: int = 6, room_max_size: int = 10, max_monsters_per_room: int = 2,
+                 console_width: int = 80, console_height: int = 50,
+                 seed: Optional[int] = None, engine: Optional[Engine] = None) -> None:
+        """
+        Args:
+            seed (int, optional): Seeds the global random before the dungeon is made, so the same seed
+                makes the same dungeon. Defaults to None.
+            engine (Engine, optional): Play this game (e.g. one that was loaded) instead of making a new one.
+                The map arguments are ignored. Defaults to None.
+        """
+        if seed is not None:
+            random.seed(seed)
+        # Random player actions get their own generator so they don't disturb the dungeon's
+        self.rng = random.Random(seed)
+
+        if engine is None:
+            engine = Engine(player=entity_factories.player.clone())
+            engine.game_map = generate_dungeon(max_rooms, room_min_size, room_max_size,
+                                               max_monsters_per_room, map_width, map_height,
+                                               engine=engine)
+        self.engine = engine
+        self.engine.profiler = Profiler(history=None)
+        self.engine.update_fov()
+
+        # The camera only shows the bit of the map around the player, so big maps still fit
+        self.console = tcod.console.Console(console_width, console_height, order="F")
+        self.turns = 0
+
+    @property
+    def timings(self) -> Dict[str, List[float]]:
+        """Duration of each phase of every turn so far, in seconds."""
+        return {phase: self.engine.profiler.samples(phase) for phase in PHASES}
+
+    def random_action(self) -> Action:
+        """Walk (or attack) in a random direction, or once in a while just wait."""
+        player = self.engine.player
+        if self.rng.random() < 0.1:
+            return WaitAction(player)
+        dx, dy = self.rng.choice(DIRECTIONS)
+        return BumpAction(player, dx, dy)
+
+    def step(self, action: Optional[Action] = None, render: bool = True) -> None:
+        """Play one turn.
+
+        Args:
+            action (Action, optional): What the player does. Defaults to a random action.
+            render (bool, optional): Draw the frame afterwards. Defaults to True.
+        """
+        engine = self.engine
+        profiler = engine.profiler
+        if action is None:
+            action = self.random_action()
+
+        # Same as MainGameEventHandler.handle_events
+        with profiler.phase("player", type(action).__name__):
+            action.perform()
+        if engine.journal is not None:
+            engine.journal.record(action)
+        with profiler.phase("ai"):
+            engine.handle_enemy_turns()
+        with profiler.phase("fov"):
+            engine.update_fov()
+        self.turns += 1
+
+        if render:
+            self.render()
+
+    def render(self) -> None:
+        """Draw a frame into the offscreen console."""
+        self.console.clear()
+        with self.engine.profiler.phase("render"):
+            self.engine.render(self.console)
+
+    def run(self, turns: int, actions: Optional[Iterable[Action]] = None, render: bool = True) -> int:
+        """Play up to `turns` turns, stopping early if the player dies or the actions run out.
+
+        Args:
+            turns (int): Most turns to play
+            actions (Iterable[Action], optional): Scripted player actions. Defaults to random ones.
+            render (bool, optional): Draw a frame after every turn. Defaults to True.
+
+        Returns:
+            int: Number of turns actually played
+        """
+        script = iter(actions) if actions is not None else None
+        played = 0
+        while played < turns and self.engine.player.is_alive:
+            if script is None:
+                action = None
+            else:
+                action = next(script, None)
+                if action is None:
+                    break
+            self.step(action, render=render)
+            played += 1
+        return played
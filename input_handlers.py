@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Dict, Optional, TYPE_CHECKING
+import time
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
 
 import tcod
 
@@ -9,6 +10,56 @@ if TYPE_CHECKING:
     from engine import Engine
 
 
+class FrameLimiter:
+    """Keeps a polling loop from going faster than max_fps."""
+
+    def __init__(self, max_fps: float = 60) -> None:
+        self.max_fps = max_fps
+        self._next_frame = 0.0
+
+    def wait(self) -> None:
+        """Sleep until it's time for the next frame."""
+        now = time.perf_counter()
+        if now < self._next_frame:
+            time.sleep(self._next_frame - now)
+            now = self._next_frame
+        # If we're running behind, don't try to catch up with a burst of frames
+        self._next_frame = max(now, self._next_frame) + 1 / self.max_fps
+
+
+def coalesce_events(events: Iterable[tcod.event.Event], max_key_repeats: Optional[int] = None) -> List[tcod.event.Event]:
+    """Drop events that would only make the game do extra work for nothing.
+
+    - Only the last mouse motion is kept, nothing cares where the mouse was on the way there.
+    - If max_key_repeats is set, a held key only gets that many repeats. Otherwise a key
+      held through a slow frame would keep on playing turns long after it was let go.
+
+    Args:
+        events (Iterable[tcod.event.Event]): Events in the order they happened
+        max_key_repeats (int, optional): Most key repeats to keep per key. Defaults to no limit.
+
+    Returns:
+        List[tcod.event.Event]: What's left, still in order
+    """
+    events = list(events)
+    last_motion = None
+    for i, event in enumerate(events):
+        if isinstance(event, tcod.event.MouseMotion):
+            last_motion = i
+
+    kept = []
+    repeats: Dict[int, int] = {}
+    for i, event in enumerate(events):
+        if isinstance(event, tcod.event.MouseMotion) and i != last_motion:
+            continue
+        if max_key_repeats is not None and isinstance(event, tcod.event.KeyDown) and event.repeat:
+            count = repeats[event.sym] = repeats.get(event.sym, 0) + 1
+            if count > max_key_repeats:
+                continue
+        kept.append(event)
+    return kept
+
+
 class EventHandler(tcod.event.EventDispatch[Action]):
     def __init__(self, engine: Engine) -> None:
         self.engine = engine
@@ -18,14 +69,52 @@ class EventHandler(tcod.event.EventDispatch[Action]):
         """Read and process keys that should be recognised for inputs"""
         pass
 
-    def handle_events(self, context: tcod.context.Context) -> None:
-        for event in tcod.event.wait():
+    def get_events(self, context: tcod.context.Context) -> List[tcod.event.Event]:
+        """Everything that happened since last time, cut down by coalesce_events.
+        Waits for something to happen, unless the engine is set to poll, in which case it
+        waits for the next frame instead and might return nothing."""
+        engine = self.engine
+        if engine.poll_input:
+            engine.frame_limiter.wait()
+            events = tcod.event.get()
+        else:
+            events = tcod.event.wait()
+        # Drain the whole queue, so nothing waits behind a backlog for the next call
+        events = list(events)
+        kept = coalesce_events(events, engine.max_key_repeats)
+        engine.profiler.count("input.events", len(events))
+        engine.profiler.count("input.dropped", len(events) - len(kept))
+        for event in kept:
             context.convert_event(event)
-            self.dispatch(event)
+        return kept
+
+    def handle_events(self, context: tcod.context.Context) -> None:
+        handler = self
+        for event in self.get_events(context):
+            handler.handle_event(event)
+            # An event can switch handlers (e.g. opening the history), the new one gets the rest
+            handler = self.engine.event_handler
+
+    def handle_event(self, event: tcod.event.Event) -> None:
+        self.dispatch(event)
 
     def ev_mousemotion(self, event: "tcod.event.MouseMotion") -> None:
-        if self.engine.game_map.in_bounds(event.tile.x, event.tile.y):
-            self.engine.mouse_location = event.tile.x, event.tile.y
+        x, y = self.engine.camera.to_map(event.tile.x, event.tile.y)
+        if self.engine.game_map.in_bounds(x, y):
+            if self.engine.mouse_location != (x, y):
+                # Names under the mouse might change
+                self.engine.needs_render = True
+            self.engine.mouse_location = x, y
+
+    def ev_windowexposed(self, event: tcod.event.WindowEvent) -> None:
+        # The window needs its contents back
+        self.engine.needs_render = True
+
+    def ev_windowresized(self, event: tcod.event.WindowResized) -> None:
+        self.engine.needs_render = True
+
+    def ev_windowrestored(self, event: tcod.event.WindowEvent) -> None:
+        self.engine.needs_render = True
 
     def ev_quit(self, event: tcod.event.Quit) -> Optional[Action]:
         raise SystemExit()
@@ -34,6 +123,39 @@ class EventHandler(tcod.event.EventDispatch[Action]):
         self.engine.render(console)
 
 
+def toggle_profiler_overlay(engine: Engine) -> None:
+    engine.profiler.show_overlay = not engine.profiler.show_overlay
+    engine.needs_render = True
+
+
+def dump_profile(engine: Engine) -> None:
+    """Write the phase timings to profile.csv, profile.json and profile_trace.json (Chrome trace)."""
+    engine.profiler.dump_csv("profile.csv")
+    engine.profiler.dump_json("profile.json")
+    engine.profiler.dump_chrome_trace("profile_trace.json")
+    engine.message_log.add_message("Profile written to profile.csv/.json, trace to profile_trace.json")
+    engine.needs_render = True
+
+
+def toggle_cprofile(engine: Engine) -> None:
+    """Start a cProfile run, or stop it and write profile.pstats."""
+    if engine.profiler.cprofile_running:
+        engine.profiler.stop_cprofile("profile.pstats")
+        engine.message_log.add_message("cProfile stopped, written to profile.pstats")
+    else:
+        engine.profiler.start_cprofile()
+        engine.message_log.add_message("cProfile started")
+    engine.needs_render = True
+
+
+# Debug keys for looking at performance
+PROFILER_KEYS = {
+    tcod.event.K_F3: toggle_profiler_overlay,
+    tcod.event.K_F4: dump_profile,
+    tcod.event.K_F5: toggle_cprofile,
+}
+
+
 class MainGameEventHandler(EventHandler):
 
     def read_keys(self, keys: Dict):
@@ -50,18 +172,23 @@ class MainGameEventHandler(EventHandler):
                 keysym = getattr(tcod.event, k)
                 self.WAIT_KEYS.append(keysym)
 
-    def handle_events(self, context: tcod.context.Context) -> None:
-        for event in tcod.event.wait():
-            context.convert_event(event)
-            action = self.dispatch(event)
+    def handle_event(self, event: tcod.event.Event) -> None:
+        action = self.dispatch(event)
 
-            if action is not None:
-                # It's me doing the action because we're responding to events
+        if action is not None:
+            profiler = self.engine.profiler
+            # It's me doing the action because we're responding to events
+            with profiler.phase("player", type(action).__name__):
                 action.perform()
-                # Let the enemies act
+            if self.engine.journal is not None:
+                self.engine.journal.record(action)
+            # Let the enemies act
+            with profiler.phase("ai"):
                 self.engine.handle_enemy_turns()
-                # Update FOV in case something changed
+            # Update FOV in case something changed
+            with profiler.phase("fov"):
                 self.engine.update_fov()
+            self.engine.needs_render = True
 
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[Action]:
         action: Optional[Action] = None
@@ -79,19 +206,19 @@ class MainGameEventHandler(EventHandler):
             action = EscapeAction(player)
         elif key == tcod.event.K_v:
             self.engine.event_handler = HistoryViewer(self.engine)
+        elif key in PROFILER_KEYS:
+            PROFILER_KEYS[key](self.engine)
         # No valid key was pressed
         return action
 
 
 class GameOverEventHandler(EventHandler):
 
-    def handle_events(self, context: tcod.context.Context) -> None:
-        for event in tcod.event.wait():
-            context.convert_event(event)
-            action = self.dispatch(event)
+    def handle_event(self, event: tcod.event.Event) -> None:
+        action = self.dispatch(event)
 
-            if action is not None:
-                action.perform()
+        if action is not None:
+            action.perform()
 
     def ev_keydown(self, event: tcod.event.KeyDown) -> Optional[Action]:
         action: Optional[Action] = None
@@ -111,7 +238,7 @@ class HistoryViewer(EventHandler):
 
     def __init__(self, engine: Engine) -> None:
         super().__init__(engine)
-        self.log_length = len(engine.message_log.messages)
+        self.log_length = len(engine.message_log)
         self.cursor = self.log_length - 1
 
     def read_keys(self, keys: Dict):
@@ -133,10 +260,10 @@ class HistoryViewer(EventHandler):
         log_console.print_box(0, 0, log_console.width, 1,
                               "┤Message history├", alignment=tcod.CENTER)
 
-        # Render the message log using the cursor parameter
+        # Render the message log up to the cursor
         self.engine.message_log.render_messages(log_console, 1, 1,
                                                 log_console.width-2, log_console.height-2,
-                                                self.engine.message_log.messages[:self.cursor+1]
+                                                self.engine.message_log, end=self.cursor+1
                                                 )
         log_console.blit(console, 3, 3)
 
@@ -155,6 +282,7 @@ class HistoryViewer(EventHandler):
             else:
                 # Move while stayin gclamped to the bounds of the history log
                 self.cursor = max(0, min(self.cursor + adjust, self.log_length-1))
+                self.engine.needs_render = True
         else:  # Any other key moves back to the main game state.
             if self.engine.player.is_alive:
                 self.engine.event_handler = MainGameEventHandler(self.engine)
@@ -0,0 +1,181 @@
+"""Recording games as a seed plus every player action, and playing them back.
+
+The game doesn't use random numbers once the dungeon is made, so the seed and the actions are
+enough to get back to exactly the same state. A journal file is a small header (format, seed and
+dungeon settings) and then 3 bytes per turn, appended as the game goes so a crash doesn't lose it.
+"""
+from __future__ import annotations
+
+import os
+import struct
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Tuple, Type, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+
+from actions import Action, BumpAction, MeleeAction, MovementAction, WaitAction
+from headless import Simulation
+from save_game import load_game, save_game
+
+if TYPE_CHECKING:
+    from entity import Actor
+
+MAGIC = b"RLJ1"
+# Magic, seed, then the dungeon settings as in generate_dungeon
+HEADER = struct.Struct("<4sQ6i")
+# What the player did (index into ACTIONS), dx, dy
+RECORD_DT = np.dtype([("action", np.uint8), ("dx", np.int8), ("dy", np.int8)])
+
+# Every action a player can take that changes the game. The index is what goes in the journal.
+ACTIONS: List[Type[Action]] = [WaitAction, BumpAction, MovementAction, MeleeAction]
+ACTION_CODES: Dict[Type[Action], int] = {action: code for code, action in enumerate(ACTIONS)}
+
+
+class JournalHeader(NamedTuple):
+    seed: int
+    map_width: int
+    map_height: int
+    max_rooms: int
+    room_min_size: int
+    room_max_size: int
+    max_monsters_per_room: int
+
+
+class Journal:
+    """Writes a journal. Give it to the engine (engine.journal) and every player action gets recorded."""
+
+    def __init__(self, path: str, header: JournalHeader) -> None:
+        self.path = path
+        self.header = header
+        self.turns = 0
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, *header))
+        self._file.flush()
+
+    def record(self, action: Action) -> None:
+        """Add a player action that was just performed."""
+        code = ACTION_CODES[type(action)]
+        dx, dy = (action.dx, action.dy) if hasattr(action, "dx") else (0, 0)
+        self._file.write(bytes((code, dx & 0xFF, dy & 0xFF)))
+        # A bug report is no good if the last turns are stuck in a buffer
+        self._file.flush()
+        self.turns += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_journal(path: str) -> Tuple[JournalHeader, np.ndarray]:
+    """Read a journal.
+
+    Args:
+        path (str): Journal file
+
+    Raises:
+        ValueError: It isn't a journal, or it's from a different version
+
+    Returns:
+        Tuple[JournalHeader, np.ndarray]: The header, and one RECORD_DT row per turn
+    """
+    with open(path, "rb") as fp:
+        magic, *fields = HEADER.unpack(fp.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} isn't a journal this version can read")
+        records = np.fromfile(fp, dtype=RECORD_DT)
+    return JournalHeader(*fields), records
+
+
+def decode_action(record: np.void, player: Actor) -> Action:
+    """Turn a journal record back into the action the player took."""
+    action = ACTIONS[record["action"]]
+    if action is WaitAction:
+        return WaitAction(player)
+    return action(player, int(record["dx"]), int(record["dy"]))
+
+
+class Replay:
+    """Plays a journal back headlessly, as fast as it'll go.
+
+    Every `snapshot_every` turns the game gets saved on the way, so going to a turn later on only
+    has to play from the closest snapshot before it instead of from the start.
+    Frames aren't drawn, except for the one at the end. FOV still gets worked out every turn, since
+    monsters only act when they can be seen.
+    """
+
+    def __init__(self, path: str, snapshot_every: int = 1000, snapshot_directory: Optional[str] = None) -> None:
+        """
+        Args:
+            path (str): Journal to play
+            snapshot_every (int, optional): Turns between snapshots, 0 for none. Defaults to 1000.
+            snapshot_directory (str, optional): Where snapshots go. Defaults to next to the journal.
+        """
+        self.header, self.records = read_journal(path)
+        self.snapshot_every = snapshot_every
+        self.snapshot_directory = snapshot_directory or f"{path}.snapshots"
+        # Turns that have a snapshot
+        self.snapshots: List[int] = []
+        self.sim: Optional[Simulation] = None
+
+    @property
+    def turns(self) -> int:
+        """Turns in the journal."""
+        return len(self.records)
+
+    def _snapshot_path(self, turn: int) -> str:
+        return os.path.join(self.snapshot_directory, f"turn{turn:08d}")
+
+    def _start(self) -> Simulation:
+        header = self.header
+        return Simulation(map_width=header.map_width, map_height=header.map_height, max_rooms=header.max_rooms,
+                          room_min_size=header.room_min_size, room_max_size=header.room_max_size,
+                          max_monsters_per_room=header.max_monsters_per_room, seed=header.seed)
+
+    def _save_snapshot(self, sim: Simulation) -> None:
+        directory = self._snapshot_path(sim.turns)
+        save_game(sim.engine, directory)
+        # Monsters follow the flow field, so it has to come back exactly as it was
+        flow_field = sim.engine.flow_field
+        np.savez(os.path.join(directory, "flow_field.npz"),
+                 distance=flow_field.distance if flow_field.distance is not None else np.zeros((0, 0)),
+                 root=np.array(flow_field.root), stale=np.array(flow_field.stale))
+        self.snapshots.append(sim.turns)
+
+    def _load_snapshot(self, turn: int) -> Simulation:
+        directory = self._snapshot_path(turn)
+        engine = load_game(directory)
+        with np.load(os.path.join(directory, "flow_field.npz")) as data:
+            distance = data["distance"] if data["distance"].size else None
+            engine.flow_field.restore(engine.game_map, distance, tuple(data["root"].tolist()), bool(data["stale"]))
+        sim = Simulation(engine=engine)
+        sim.turns = turn
+        return sim
+
+    def seek(self, turn: Optional[int] = None) -> Simulation:
+        """Get the game as it was after `turn` turns.
+
+        Args:
+            turn (int, optional): Turns played. Defaults to the whole journal.
+
+        Returns:
+            Simulation: The game, with the final frame drawn on its console
+        """
+        turn = self.turns if turn is None else max(0, min(turn, self.turns))
+
+        # Start from whatever is closest without going past: where we are now, a snapshot, or the beginning
+        sim = self.sim
+        if sim is None or sim.turns > turn:
+            sim = None
+        best_snapshot = max((snapshot for snapshot in self.snapshots if snapshot <= turn), default=None)
+        if best_snapshot is not None and (sim is None or sim.turns < best_snapshot):
+            sim = self._load_snapshot(best_snapshot)
+        if sim is None:
+            sim = self._start()
+
+        player = sim.engine.player
+        while sim.turns < turn and player.is_alive:
+            sim.step(decode_action(self.records[sim.turns], player), render=False)
+            if self.snapshot_every and sim.turns % self.snapshot_every == 0 and sim.turns not in self.snapshots:
+                self._save_snapshot(sim)
+
+        sim.render()
+        self.sim = sim
+        return sim
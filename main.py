@@ -1,12 +1,13 @@
 #!/usr/bin/env python3
-import copy
+import random
 
 from tcod import console
-from procgen import generate_dungeon
+from procgen import LevelPregenerator
 import tcod
 
 from engine import Engine
 import entity_factories
+from journal import Journal, JournalHeader
 import color
 
 
@@ -28,16 +29,22 @@ def main():
     )
 
     # init player
-    player = copy.deepcopy(entity_factories.player)
+    player = entity_factories.player.clone()
 
     # init engine
-    engine = Engine(player=player)
+    engine = Engine(player=player, viewport_width=map_width, viewport_height=map_height)
 
-    # init map
-    engine.game_map = generate_dungeon(
-        max_rooms, room_min_size, room_max_size, max_monsters_per_room, map_width, map_height, engine=engine)
+    # Every game gets a seed and is recorded, so it can be played back with journal.Replay
+    seed = random.getrandbits(32)
+    random.seed(seed)
+    engine.journal = Journal("last_session.journal", JournalHeader(
+        seed, map_width, map_height, max_rooms, room_min_size, room_max_size, max_monsters_per_room))
 
-    engine.update_fov()
+    # init map. The first floor is made right away, after that the next one is always
+    # being made in the background
+    engine.level_generator = LevelPregenerator(
+        engine, max_rooms, room_min_size, room_max_size, max_monsters_per_room, map_width, map_height)
+    engine.next_floor()
 
     # Welcome message!
     engine.message_log.add_message(
@@ -45,17 +52,31 @@ def main():
 
     # The context is the window that you actually see
     # The console is the internal buffer that holds the next frame of the game
-    with tcod.context.new_terminal(
-            screen_width, screen_height, tileset=tileset, title="RLDev2021", vsync=True,) as context:
-        root_console = tcod.Console(screen_width, screen_height, order="F")
-
-        # MAIN LOOP
-        while True:
-            root_console.clear()
-            engine.event_handler.on_render(console=root_console)
-            context.present(root_console)
-
-            engine.event_handler.handle_events(context)
+    try:
+        with tcod.context.new_terminal(
+                screen_width, screen_height, tileset=tileset, title="RLDev2021", vsync=True,) as context:
+            root_console = tcod.Console(screen_width, screen_height, order="F")
+
+            # MAIN LOOP
+            while True:
+                # Only draw when something changed, otherwise the last frame is still good
+                if engine.needs_render:
+                    root_console.clear()
+                    with engine.profiler.phase("render"):
+                        engine.event_handler.on_render(console=root_console)
+                    with engine.profiler.phase("present"):
+                        context.present(root_console)
+                    engine.needs_render = False
+
+                engine.event_handler.handle_events(context)
+    finally:
+        # However the game ends (quitting raises SystemExit), don't leave the floor generator running
+        # or evicted floors lying around on disk
+        engine.level_generator.shutdown()
+        engine.world.close()
+        # Flush what's been written of the message log's spill file and the journal
+        engine.message_log.close()
+        engine.journal.close()
 
 
 if __name__ == '__main__':
@@ -1,5 +1,6 @@
 from types import resolve_bases
-from typing import List, Reversible, Tuple
+import json
+from typing import Dict, IO, Iterator, List, Optional, Sequence, Tuple, Union
 import textwrap
 
 import tcod
@@ -7,13 +8,28 @@ from tcod.console import Console
 from tcod.libtcodpy import ConsoleBuffer
 
 import color
+from compositor import Layer
 
 
 class Message:
+    __slots__ = ("plain_text", "fg", "_count", "_lines")
+
     def __init__(self, text: str, fg: Tuple[int, int, int]) -> None:
         self.plain_text = text
         self.fg = fg
-        self.count = 1
+        self._count = 1
+        # Wrapped lines of full_text, by width
+        self._lines: Dict[int, List[str]] = {}
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @count.setter
+    def count(self, value: int) -> None:
+        self._count = value
+        # The text changed, so the lines have to be wrapped again
+        self._lines.clear()
 
     @property
     def full_text(self) -> str:
@@ -23,10 +39,45 @@ class Message:
         else:
             return self.plain_text
 
+    def wrap(self, width: int) -> List[str]:
+        """The full text wrapped to a width. Only worked out once per width, so don't modify it."""
+        lines = self._lines.get(width)
+        if lines is None:
+            lines = self._lines[width] = textwrap.wrap(self.full_text, width)
+        return lines
+
 
 class MessageLog:
-    def __init__(self) -> None:
-        self.messages: List[Message] = []
+    """The most recent `capacity` messages, oldest first. Index it like a list.
+
+    Once it's full, every new message pushes the oldest one out. If there's a spill_path
+    they're appended to that file (one JSON object per line) instead of being lost.
+    """
+
+    def __init__(self, capacity: int = 1000, spill_path: Optional[str] = None) -> None:
+        self.capacity = capacity
+        self.spill_path = spill_path
+        # Ring buffer. The oldest message is at _start, and it wraps around from the end to the start.
+        self._messages: List[Optional[Message]] = [None] * capacity
+        self._start = 0
+        self._length = 0
+        # Messages pushed out so far
+        self.spilled = 0
+        self._spill_file: Optional[IO[str]] = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> Message:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("message index out of range")
+        return self._messages[(self._start + index) % self.capacity]  # type: ignore
+
+    def __iter__(self) -> Iterator[Message]:
+        for i in range(self._length):
+            yield self[i]
 
     def add_message(self,
                     text: str, fg: Tuple[int, int, int] = color.white,
@@ -41,23 +92,53 @@ class MessageLog:
 
         # If this message is set to stack, if there's at least one message, if that last message has the same text
         # ... then we just increment the count
-        if stack and self.messages and text == self.messages[-1].plain_text:
-            self.messages[-1].count += 1
+        if stack and self._length and text == self[-1].plain_text:
+            self[-1].count += 1
+            return
+
+        message = Message(text, fg)
+        if self._length < self.capacity:
+            self._messages[(self._start + self._length) % self.capacity] = message
+            self._length += 1
         else:
-            self.messages.append(Message(text, fg))
+            # Full, so the new message takes the oldest one's place
+            self._spill(self._messages[self._start])  # type: ignore
+            self._messages[self._start] = message
+            self._start = (self._start + 1) % self.capacity
+
+    def _spill(self, message: Message) -> None:
+        self.spilled += 1
+        if self.spill_path is None:
+            return
+        if self._spill_file is None:
+            self._spill_file = open(self.spill_path, "a")
+        self._spill_file.write(json.dumps({"text": message.plain_text, "fg": message.fg, "count": message.count}) + "\n")
 
-    def render(self, console: Console, x: int, y: int, width: int, height: int,) -> None:
+    def close(self) -> None:
+        """Close the spill file, if it's open."""
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def render(self, console: Union[Console, Layer], x: int, y: int, width: int, height: int,) -> None:
         """Render this log over the given area."""
-        self.render_messages(console, x, y, width, height, self.messages)
+        self.render_messages(console, x, y, width, height, self)
 
     @staticmethod
     def render_messages(
-            console: tcod.Console, x: int, y: int, width: int, height: int, messages: Reversible[Message], ) -> None:
-        """Render the messages provided."""
+            console: Union[tcod.Console, Layer], x: int, y: int, width: int, height: int, messages: Sequence[Message],
+            end: Optional[int] = None) -> None:
+        """Render the messages provided, newest at the bottom.
+
+        Args:
+            end (int, optional): Only render messages before this index. Defaults to all of them.
+        """
         y_offset = height-1
 
-        for message in reversed(messages):
-            for line in reversed(textwrap.wrap(message.full_text, width)):
+        # Walk back from the newest message, so only what fits gets looked at
+        for index in range(len(messages) if end is None else end, 0, -1):
+            message = messages[index - 1]
+            for line in reversed(message.wrap(width)):
                 console.print(x=x, y=y+y_offset, string=line, fg=message.fg)
                 y_offset -= 1
                 if y_offset < 0:
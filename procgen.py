@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import Iterator, TYPE_CHECKING, Tuple, List
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple, TYPE_CHECKING
 import random
 
+import numpy as np  # type:ignore
 import tcod
 
 import entity_factories
@@ -12,11 +14,14 @@ import tile_types
 if TYPE_CHECKING:
     from engine import Engine
 
+# The tiles a dungeon is made of
+WALL, FLOOR = tile_types.wall, tile_types.floor
+
 
 class RectangularRoom:
     def __init__(self, x: int, y: int, width: int, height: int) -> None:
         self.x1, self.y1 = x, y
-        self.x2, self.y2 = x+width, y+width
+        self.x2, self.y2 = x+width, y+height
 
     @property
     def center(self) -> Tuple[int, int]:
@@ -29,12 +34,38 @@ class RectangularRoom:
         """Return the inner area of this room as a 2D array index. Doesn't include the actual values, just where to slice them"""
         return slice(self.x1+1, self.x2), slice(self.y1+1, self.y2)
 
+    @property
+    def outer(self) -> Tuple[slice, slice]:
+        """Return the whole area of this room, walls included, as a 2D array index."""
+        return slice(self.x1, self.x2+1), slice(self.y1, self.y2+1)
+
     def intersects(self, other: RectangularRoom) -> bool:
         return(self.x1 <= other.x2 and self.x2 >= other.x1 and self.y1 <= other.y2 and self.y2 >= other.y1)
 
 
-def generate_dungeon(max_rooms: int, room_min_size: int, room_max_size: int, max_monsters_per_room: int, map_width: int, map_height: int, engine: Engine) -> GameMap:
-    """We make it a dungeon of rectangular rooms connected by paths
+class DungeonLayout:
+    """Everything needed to build a level, without any of the game objects.
+    Small and picklable, so layouts can be made in other processes and kept around.
+    """
+
+    def __init__(self, tiles: np.ndarray, player_start: Tuple[int, int], spawns: List[Tuple[str, int, int]], seed: int) -> None:
+        self.tiles = tiles  # Tile ID of every tile, same as GameMap.tiles
+        self.player_start = player_start
+        self.spawns = spawns  # (name in entity_factories, x, y) of every monster
+        self.seed = seed  # Seed that makes this exact layout again
+
+    @property
+    def width(self) -> int:
+        return self.tiles.shape[0]
+
+    @property
+    def height(self) -> int:
+        return self.tiles.shape[1]
+
+
+def generate_layout(max_rooms: int, room_min_size: int, room_max_size: int, max_monsters_per_room: int, map_width: int, map_height: int, seed: Optional[int] = None) -> DungeonLayout:
+    """Lay out a dungeon of rectangular rooms connected by paths. Doesn't touch any game state,
+    so the same seed always gives the same layout.
 
     Args:
         max_rooms (int): Max number of rooms to generate
@@ -43,67 +74,169 @@ def generate_dungeon(max_rooms: int, room_min_size: int, room_max_size: int, max
         max_monsters_per_room (int): Max number of monsters per room
         map_width (int): Map how big X
         map_height (int): Map how big Y
-        engine (Engine): Reference to engine for map to use
+        seed (int, optional): Seed for the layout. Defaults to one drawn from the global random.
 
     Returns:
-        GameMap: Game map containing rooms and the player
+        DungeonLayout: Tiles, where the player starts, and what to spawn where
     """
+    if seed is None:
+        seed = random.getrandbits(32)
+    rng = random.Random(seed)
 
-    # Grab player reference from engine
-    player = engine.player
-
-    # Init map
-    dungeon = GameMap(engine, map_width, map_height, entities=[player])
+    tiles = np.full((map_width, map_height), fill_value=WALL, dtype=tile_types.tile_id_dt, order="F")
+    player_start = (0, 0)
+    spawns: List[Tuple[str, int, int]] = []
+    occupied: Set[Tuple[int, int]] = set()
 
     rooms: List[RectangularRoom] = []
+    # Every tile covered by a room, walls included, to check new rooms against in one go
+    room_mask = np.zeros((map_width, map_height), dtype=bool, order="F")
 
     for r in range(max_rooms):
 
         # new room parameters
-        room_width = random.randint(room_min_size, room_max_size)
-        room_height = random.randint(room_min_size, room_max_size)
-        x = random.randint(0, dungeon.width-room_width-1)
-        y = random.randint(0, dungeon.height-room_height-1)
+        room_width = rng.randint(room_min_size, room_max_size)
+        room_height = rng.randint(room_min_size, room_max_size)
+        x = rng.randint(0, map_width-room_width-1)
+        y = rng.randint(0, map_height-room_height-1)
         new_room = RectangularRoom(x, y, room_width, room_height)
 
-        # Check whether they intersect existing rooms
-        if any(new_room.intersects(other_room) for other_room in rooms):
+        # Check whether they intersect existing rooms. Same as RectangularRoom.intersects against
+        # every room so far, but only looks at the tiles the new room covers.
+        if room_mask[new_room.outer].any():
             continue
 
         # If the above didn't continue then we can add the room
-        dungeon.tiles[new_room.inner] = tile_types.floor
+        room_mask[new_room.outer] = True
+        tiles[new_room.inner] = FLOOR
 
         if len(rooms) == 0:
             # First room is where the player starts
-            player.place(*new_room.center, dungeon)
+            player_start = new_room.center
+            occupied.add(player_start)
         else:
             # room needs a tunnel
-            for x, y in tunnel_between(rooms[-1].center, new_room.center):
-                dungeon.tiles[x, y] = tile_types.floor
+            tiles[tunnel_between(rooms[-1].center, new_room.center, rng)] = FLOOR
 
         # Make the baddies
-        place_entities(new_room, dungeon, max_monsters_per_room)
+        place_entities(new_room, spawns, occupied, max_monsters_per_room, rng)
 
         # add the new room to the list
         rooms.append(new_room)
 
+    return DungeonLayout(tiles, player_start, spawns, seed)
+
+
+def populate_dungeon(layout: DungeonLayout, engine: Engine) -> GameMap:
+    """Turn a layout into a map with all the monsters on it, but not the player.
+    Doesn't change any existing game state, so it's safe to do on another thread.
+
+    Args:
+        layout (DungeonLayout): Layout to build
+        engine (Engine): Reference to engine for map to use
+
+    Returns:
+        GameMap: Game map containing rooms and monsters
+    """
+    dungeon = GameMap(engine, layout.width, layout.height, tiles=layout.tiles.copy(order="F"))
+
+    for name, x, y in layout.spawns:
+        getattr(entity_factories, name).spawn(dungeon, x, y)
+
     return dungeon
 
 
-def tunnel_between(start: Tuple[int, int], end: Tuple[int, int]) -> Iterator[Tuple[int, int]]:
+def build_dungeon(layout: DungeonLayout, engine: Engine) -> GameMap:
+    """Turn a layout into a playable map, with the engine's player and all the monsters on it.
+
+    Args:
+        layout (DungeonLayout): Layout to build
+        engine (Engine): Reference to engine for map to use
+
+    Returns:
+        GameMap: Game map containing rooms and the player
+    """
+    dungeon = populate_dungeon(layout, engine)
+    engine.player.place(*layout.player_start, dungeon)
+    return dungeon
+
+
+def generate_dungeon(max_rooms: int, room_min_size: int, room_max_size: int, max_monsters_per_room: int, map_width: int, map_height: int, engine: Engine, seed: Optional[int] = None) -> GameMap:
+    """We make it a dungeon of rectangular rooms connected by paths
+
+    Args:
+        max_rooms (int): Max number of rooms to generate
+        room_min_size (int): Smallest room in either dimension
+        room_max_size (int): Largest room in either dimension
+        max_monsters_per_room (int): Max number of monsters per room
+        map_width (int): Map how big X
+        map_height (int): Map how big Y
+        engine (Engine): Reference to engine for map to use
+        seed (int, optional): Seed for the layout. Defaults to one drawn from the global random.
+
+    Returns:
+        GameMap: Game map containing rooms and the player
+    """
+    layout = generate_layout(max_rooms, room_min_size, room_max_size,
+                             max_monsters_per_room, map_width, map_height, seed)
+    return build_dungeon(layout, engine)
+
+
+def _generate_layout_from_args(args: Tuple[int, int, int, int, int, int], seed: int) -> DungeonLayout:
+    # Module level so worker processes can unpickle it
+    return generate_layout(*args, seed=seed)
+
+
+def submit_layouts(executor: Executor, count: int, max_rooms: int, room_min_size: int, room_max_size: int, max_monsters_per_room: int, map_width: int, map_height: int, seed: Optional[int] = None) -> List[Future]:
+    """Start generating `count` layouts on an executor, e.g. to fill a level cache in the background.
+
+    Args:
+        executor (Executor): Where to do the work
+        count (int): Number of layouts
+        seed (int, optional): Seed for the whole batch. Each layout gets its own seed derived from it.
+        Other arguments are the same as generate_layout.
+
+    Returns:
+        List[Future]: One future per layout, resolving to a DungeonLayout
+    """
+    rng = random.Random(seed)
+    args = (max_rooms, room_min_size, room_max_size, max_monsters_per_room, map_width, map_height)
+    return [executor.submit(_generate_layout_from_args, args, rng.getrandbits(32)) for _ in range(count)]
+
+
+def generate_layouts(count: int, max_rooms: int, room_min_size: int, room_max_size: int, max_monsters_per_room: int, map_width: int, map_height: int, seed: Optional[int] = None, workers: Optional[int] = None) -> List[DungeonLayout]:
+    """Generate a batch of layouts across a pool of processes. The same seed always gives the same batch.
+
+    Args:
+        count (int): Number of layouts
+        seed (int, optional): Seed for the whole batch. Each layout gets its own seed derived from it.
+        workers (int, optional): Number of processes. Defaults to one per CPU.
+        Other arguments are the same as generate_layout.
+
+    Returns:
+        List[DungeonLayout]: The layouts, in seed order
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = submit_layouts(executor, count, max_rooms, room_min_size, room_max_size,
+                                 max_monsters_per_room, map_width, map_height, seed)
+        return [future.result() for future in futures]
+
+
+def tunnel_between(start: Tuple[int, int], end: Tuple[int, int], rng: random.Random) -> Tuple[np.ndarray, np.ndarray]:
     """Return an L-shaped tunnel between these two points.
 
     Args:
         start (Tuple[int, int]): x,y for start of tunnel
         end (Tuple[int, int]): x,y for end of tunnel
+        rng (random.Random): Random number generator to use
 
-    Yields:
-        Iterator[Tuple[int, int]]: Iterator with coordinates that, if followed, goes from start to end
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: x and y arrays of the tunnel, ready to index a map with
     """
 
     x1, y1 = start
     x2, y2 = end
-    if random.random() < 0.5:  # 50% chance
+    if rng.random() < 0.5:  # 50% chance
         # Horizontal then vertical
         corner_x, corner_y = x2, y1
     else:
@@ -111,22 +244,84 @@ def tunnel_between(start: Tuple[int, int], end: Tuple[int, int]) -> Iterator[Tup
         corner_x, corner_y = x1, y2
 
     # Generate the coordinates between start and end via corner
-    for x, y in tcod.los.bresenham((x1, y1), (corner_x, corner_y)).tolist():
-        yield x, y
-    for x, y in tcod.los.bresenham((corner_x, corner_y), (x2, y2)).tolist():
-        yield x, y
+    path = np.concatenate([tcod.los.bresenham((x1, y1), (corner_x, corner_y)),
+                           tcod.los.bresenham((corner_x, corner_y), (x2, y2))])
+    return path[:, 0], path[:, 1]
 
 
-def place_entities(room: RectangularRoom, dungeon: GameMap, maximum_monsters: int,) -> None:
-    number_of_monsters = random.randint(0, maximum_monsters)
+def place_entities(room: RectangularRoom, spawns: List[Tuple[str, int, int]], occupied: Set[Tuple[int, int]], maximum_monsters: int, rng: random.Random) -> None:
+    number_of_monsters = rng.randint(0, maximum_monsters)
 
     for i in range(number_of_monsters):
-        x = random.randint(room.x1+1, room.x2-1)
-        y = random.randint(room.y1+1, room.y2-1)
+        x = rng.randint(room.x1+1, room.x2-1)
+        y = rng.randint(room.y1+1, room.y2-1)
 
-        if not any(entity.x == x and entity.y == y for entity in dungeon.entities):
+        if (x, y) not in occupied:
+            occupied.add((x, y))
             # TODO:Magic number probability of Troll
-            if random.random() < 0.8:
-                entity_factories.orc.spawn(dungeon, x, y)
+            if rng.random() < 0.8:
+                spawns.append(("orc", x, y))
             else:
-                entity_factories.troll.spawn(dungeon, x, y)
+                spawns.append(("troll", x, y))
+
+
+class LevelPregenerator:
+    """Generates the next floor on a worker thread while the current one is being played,
+    so changing floors doesn't have to wait for room placement, tunnels and spawning.
+    """
+
+    def __init__(self, engine: Engine, max_rooms: int, room_min_size: int, room_max_size: int, max_monsters_per_room: int, map_width: int, map_height: int) -> None:
+        self.engine = engine
+        self.args = (max_rooms, room_min_size, room_max_size, max_monsters_per_room, map_width, map_height)
+
+        # How many floors were ready in time (hits) or had to be waited for or made on the spot (misses)
+        self.hits = 0
+        self.misses = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="levelgen")
+        self._pending: Optional[Future] = None
+
+    @property
+    def ready(self) -> bool:
+        """True if take would hand over a floor made in the background, without waiting."""
+        return self._pending is not None and self._pending.done()
+
+    def _generate(self, seed: int) -> Tuple[GameMap, Tuple[int, int]]:
+        layout = generate_layout(*self.args, seed=seed)
+        return populate_dungeon(layout, self.engine), layout.player_start
+
+    def start(self) -> None:
+        """Start on the next floor in the background, unless that's already happening."""
+        if self._pending is None:
+            # Draw the seed here, so seeding the global random still makes the same floors
+            self._pending = self._executor.submit(self._generate, random.getrandbits(32))
+
+    def take(self) -> GameMap:
+        """Return the next floor with the player placed on it, and start on the one after.
+        If the background floor isn't done it's made right now instead.
+
+        Returns:
+            GameMap: The new floor
+        """
+        pending, self._pending = self._pending, None
+        if pending is not None and pending.done():
+            self.hits += 1
+            dungeon, player_start = pending.result()
+        elif pending is not None and not pending.cancel():
+            # Already halfway there, finishing it is quicker than starting over
+            self.misses += 1
+            dungeon, player_start = pending.result()
+        else:
+            self.misses += 1
+            dungeon, player_start = self._generate(random.getrandbits(32))
+
+        self.engine.player.place(*player_start, dungeon)
+        self.start()
+        return dungeon
+
+    def shutdown(self) -> None:
+        """Stop the worker thread. Anything not started yet is dropped."""
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,176 @@
+"""Cheap timers and counters for finding out where a turn's time goes."""
+from __future__ import annotations
+
+import cProfile
+import csv
+from collections import deque
+import json
+import time
+from typing import ContextManager, Deque, Dict, List, Optional, Tuple
+
+
+class PhaseStats:
+    """Running totals for one named phase."""
+
+    __slots__ = ("count", "total", "max", "last", "samples")
+
+    def __init__(self, history: Optional[int]) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        # Most recent durations, for percentiles
+        self.samples: Deque[float] = deque(maxlen=history)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        if duration > self.max:
+            self.max = duration
+        self.samples.append(duration)
+
+
+class _Phase:
+    """Context manager returned by Profiler.phase."""
+
+    __slots__ = ("profiler", "names", "start")
+
+    def __init__(self, profiler: Profiler, names: Tuple[str, ...]) -> None:
+        self.profiler = profiler
+        self.names = names
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        self.profiler.record(self.names, self.start, time.perf_counter() - self.start)
+
+
+class _NoPhase:
+    """Does nothing, for when the profiler is switched off."""
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+class Profiler:
+    """Collects how long each phase of the game loop takes, plus any counters.
+
+    Wrap code in `with profiler.phase("name"):` to time it. Giving a detail, e.g. the action's class,
+    records the same time under "name" and "name.detail". Stats can be shown in game,
+    written to CSV/JSON, or exported as a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, history: Optional[int] = 1000, trace_length: int = 10_000) -> None:
+        self.enabled = True
+        self.show_overlay = False
+        self.history = history
+
+        self.stats: Dict[str, PhaseStats] = {}
+        self.counters: Dict[str, int] = {}
+        # Values measured once a turn, e.g. how many monsters are asleep, see gauge
+        self.gauges: Dict[str, PhaseStats] = {}
+        # (name, start, duration) of the most recent phases, for the Chrome trace
+        self.trace: Deque[Tuple[str, float, float]] = deque(maxlen=trace_length)
+
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def phase(self, name: str, detail: Optional[str] = None) -> ContextManager[None]:
+        """Return a context manager that times the code inside it.
+
+        Args:
+            name (str): Name of the phase
+            detail (str, optional): Also record the time under "name.detail". Defaults to None.
+        """
+        if not self.enabled:
+            return _NO_PHASE
+        if detail is None:
+            return _Phase(self, (name,))
+        return _Phase(self, (name, f"{name}.{detail}"))
+
+    def record(self, names: Tuple[str, ...], start: float, duration: float) -> None:
+        for name in names:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = PhaseStats(self.history)
+            stats.add(duration)
+        self.trace.append((names[-1], start, duration))
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a named counter."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: float) -> None:
+        """Record what something measures right now. Unlike count, values don't add up,
+        each one is a sample with the mean, max and last kept like a phase's."""
+        if self.enabled:
+            stats = self.gauges.get(name)
+            if stats is None:
+                stats = self.gauges[name] = PhaseStats(self.history)
+            stats.add(value)
+
+    def samples(self, name: str) -> List[float]:
+        """Return the recent durations of a phase, oldest first."""
+        stats = self.stats.get(name)
+        return list(stats.samples) if stats else []
+
+    def reset(self) -> None:
+        self.stats.clear()
+        self.counters.clear()
+        self.gauges.clear()
+        self.trace.clear()
+
+    def summary(self) -> List[Dict[str, object]]:
+        """One row per phase, sorted by total time, times in milliseconds."""
+        return [{"phase": name, "count": stats.count, "total_ms": stats.total * 1000,
+                 "mean_ms": stats.mean * 1000, "max_ms": stats.max * 1000, "last_ms": stats.last * 1000}
+                for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].total)]
+
+    def dump_csv(self, path: str) -> None:
+        with open(path, "w", newline="") as fp:
+            writer = csv.DictWriter(fp, fieldnames=["phase", "count", "total_ms", "mean_ms", "max_ms", "last_ms"])
+            writer.writeheader()
+            writer.writerows(self.summary())
+
+    def dump_json(self, path: str) -> None:
+        with open(path, "w") as fp:
+            gauges = {name: {"count": stats.count, "mean": stats.mean, "max": stats.max, "last": stats.last}
+                      for name, stats in self.gauges.items()}
+            json.dump({"phases": self.summary(), "counters": self.counters, "gauges": gauges}, fp, indent=4)
+
+    def dump_chrome_trace(self, path: str) -> None:
+        """Write the recent phases in Chrome's trace event format."""
+        events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": 0, "tid": 0}
+                  for name, start, duration in self.trace]
+        with open(path, "w") as fp:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fp)
+
+    @property
+    def cprofile_running(self) -> bool:
+        return self._cprofile is not None
+
+    def start_cprofile(self) -> None:
+        """Start a full cProfile run, for when the phase timings aren't detailed enough."""
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop_cprofile(self, path: str) -> None:
+        """Stop the cProfile run and save it for pstats, snakeviz, etc."""
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(path)
+            self._cprofile = None
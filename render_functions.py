@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Union
 from tcod import console
 
 from tcod.libtcodpy import color_scale_HSV
@@ -9,6 +9,7 @@ import color
 
 if TYPE_CHECKING:
     from tcod import Console
+    from compositor import Layer
     from engine import Engine
     from game_map import GameMap
 
@@ -19,13 +20,13 @@ def get_names_at(x: int, y: int, game_map: GameMap) -> str:
         return ""
 
     names = ", ".join(
-        entity.name for entity in game_map.entities if entity.x == x and entity.y == y
+        entity.name for entity in game_map.get_entities_at(x, y)
     )
 
     return names.capitalize()
 
 
-def render_bar(console: Console, current_val: int, max_val: int, total_width: int) -> None:
+def render_bar(console: Union[Console, Layer], current_val: int, max_val: int, total_width: int) -> None:
     bar_width = int(float(current_val) / max_val * total_width)
 
     console.draw_rect(x=0, y=45, width=20, height=1, ch=1, bg=color.bar_empty)
@@ -36,9 +37,27 @@ def render_bar(console: Console, current_val: int, max_val: int, total_width: in
     console.print(x=1, y=45, string=f"HP: {current_val}/{max_val}", fg=color.bar_text)
 
 
-def render_names_at_mouse(console: Console, x: int, y: int, engine: Engine) -> None:
+def render_names_at_mouse(console: Union[Console, Layer], x: int, y: int, engine: Engine) -> None:
     mouse_x, mouse_y = engine.mouse_location
 
     names_at_mouse = get_names_at(mouse_x, mouse_y, engine.game_map)
 
     console.print(x=x, y=y, string=names_at_mouse)
+
+
+def render_profiler_overlay(console: Union[Console, Layer], engine: Engine) -> None:
+    """Draw the slowest phases of the game loop in the top right corner."""
+    rows = engine.profiler.summary()[:12]
+    lines = [f"{'phase':<18}{'last':>7}{'mean':>7}{'max':>7}"]
+    lines += [f"{row['phase'][:18]:<18}{row['last_ms']:>7.2f}{row['mean_ms']:>7.2f}{row['max_ms']:>7.2f}"
+              for row in rows]
+    lines.append(f"path cache {engine.flow_field.hit_rate:>6.0%}  fov cache {engine.fov.hit_rate:>6.0%}")
+    world = engine.world
+    lines.append(f"floors {world.resident_count}/{world.depth_count} {world.resident_bytes / 2**20:.0f}MB  "
+                 f"evicted {world.evictions}  reload {world.mean_reload_time * 1000:.1f}ms")
+
+    width = max(len(line) for line in lines) + 2
+    x = console.width - width
+    console.draw_rect(x=x, y=0, width=width, height=len(lines) + 2, ch=ord(" "), bg=color.black)
+    for i, line in enumerate(lines):
+        console.print(x=x + 1, y=i + 1, string=line, fg=color.profiler_text)
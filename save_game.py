@@ -0,0 +1,253 @@
+"""Saving and loading the game as a folder of NumPy arrays.
+
+Layout of a save:
+- meta.json: format version, map size, which entity is the player, AI class names, tile names
+- tiles.npy, visible.npy, explored.npy: the map arrays as they are in memory (tiles as tile IDs). On load they're
+  memory-mapped copy-on-write, so nothing gets read until it's used and the save never changes.
+  Or all three in a compressed map.npz, when space matters more than load time.
+- entities.npz: one column per field (position, looks, fighter stats, AI...), one row per entity
+- messages.npz: the message log, also as columns. Only in full game saves, not single floors.
+
+No pickling, so a big level costs a few array writes instead of walking the whole object graph.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+
+import components.ai
+from components.fighter import Fighter
+from entity import Actor, Entity
+from game_map import GameMap
+from entity_store import EntityStore, paused_gc, unplaced
+import tile_types
+
+if TYPE_CHECKING:
+    from engine import Engine
+
+# Bump whenever the layout changes, old saves won't load
+FORMAT_VERSION = 4
+
+# Map arrays that make it into the save
+MAP_ARRAYS = ("tiles", "visible", "explored")
+
+# Store columns that make it into the save. The rest can be worked out again.
+ENTITY_COLUMNS = ("x", "y", "hp", "max_hp", "power", "defense", "speed", "blocks_movement", "render_order", "ch", "fg",
+                  "awake_until")
+
+
+def save_map(game_map: GameMap, directory: str, *, compress: bool = False,
+             player: Optional[Entity] = None) -> None:
+    """Write a floor and its entities to a folder.
+
+    Args:
+        game_map (GameMap): Floor to save
+        directory (str): Folder to write to. Made if it doesn't exist, and any older save in it gets replaced.
+        compress (bool, optional): Squash the map arrays into one compressed map.npz. A lot smaller,
+            but they have to be read in full on load instead of memory-mapped. Defaults to False.
+        player (Entity, optional): Remember which entity is the player. Defaults to None.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    arrays = {name: getattr(game_map, name) for name in MAP_ARRAYS}
+    if compress:
+        np.savez_compressed(os.path.join(directory, "map.npz"), **arrays)
+    else:
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+
+    store = game_map.store
+    rows = np.flatnonzero(store.in_use[:store.size])
+    entities = store.entities[rows]
+    columns, ai_classes = pack_entities(store, rows, entities)
+
+    # Where each actor is on the scheduler's timeline, -1 for not on it
+    scheduler = game_map.scheduler
+    columns["next_turn"] = np.fromiter((scheduler.next_time(entity) for entity in entities), dtype=np.int64, count=len(rows))
+    columns["turn_order"] = np.fromiter((scheduler.order(entity) for entity in entities), dtype=np.int64, count=len(rows))
+    columns["dormant"] = np.fromiter((entity in scheduler.dormant for entity in entities), dtype=np.bool_, count=len(rows))
+    save = np.savez_compressed if compress else np.savez
+    save(os.path.join(directory, "entities.npz"), **columns)
+
+    player_row = int(np.flatnonzero(entities == player)[0]) if player is not None else -1
+    meta = {"version": FORMAT_VERSION, "width": game_map.width, "height": game_map.height,
+            "player": player_row, "ai_classes": ai_classes, "time": scheduler.time,
+            "tile_names": tile_types.registry.names}
+    # Written last, so a save without it never finished
+    with open(os.path.join(directory, "meta.json"), "w") as fp:
+        json.dump(meta, fp)
+
+
+def pack_entities(store: EntityStore, rows: np.ndarray, entities: Sequence[Entity]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    """Turn entities into columns that can go in an npz file, see unpack_entities.
+
+    Args:
+        store (EntityStore): Store the entities are in
+        rows (np.ndarray): Their rows in it
+        entities (Sequence[Entity]): The entities, in the same order
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], List[str]]: The columns, and the AI class names their "ai" column goes by
+    """
+    # The store already has nearly everything in columns, just pick out the rows
+    columns: Dict[str, np.ndarray] = {name: getattr(store, name)[rows] for name in ENTITY_COLUMNS}
+
+    # The rest has to come off the objects
+    ai_classes: List[str] = []
+    ai = np.full(len(rows), -1, dtype=np.int8)  # Index into ai_classes, -1 for none
+    for i, entity in enumerate(entities):
+        entity_ai = getattr(entity, "ai", None)
+        if entity_ai:
+            ai_name = type(entity_ai).__name__
+            if ai_name not in ai_classes:
+                ai_classes.append(ai_name)
+            ai[i] = ai_classes.index(ai_name)
+    columns["ai"] = ai
+    columns["actor"] = np.fromiter((isinstance(entity, Actor) for entity in entities), dtype=np.bool_, count=len(rows))
+    columns["name"] = np.array([entity.name for entity in entities], dtype=np.str_)
+    return columns, ai_classes
+
+
+def unpack_entities(columns: Dict[str, np.ndarray], ai_classes: Sequence[str]) -> List[Entity]:
+    """Build entities from columns made by pack_entities. They aren't on any map.
+
+    Args:
+        columns (Dict[str, np.ndarray]): The columns
+        ai_classes (Sequence[str]): The AI class names that came with them
+
+    Returns:
+        List[Entity]: The entities
+    """
+    classes = [getattr(components.ai, name) for name in ai_classes]
+    ai = columns["ai"]
+    # The alive and hostile columns follow from the AI, set them for everyone at once here instead of
+    # one at a time through the Actor.ai setter. -1 (no AI) picks the False on the end.
+    hostile = np.array([cls.hostile for cls in classes] + [False], dtype=np.bool_)[ai]
+    columns = dict(columns, alive=ai >= 0, hostile=hostile)
+
+    # Build the entities straight from the columns, like Entity.clone does. Their fields
+    # go into rows of the unplaced store in one go, the objects only need the rest.
+    actor_flags = columns["actor"].tolist()
+    with paused_gc():
+        entities: List[Entity] = [object.__new__(Actor if actor else Entity) for actor in actor_flags]
+        unplaced.extend(entities, columns)
+        for entity, name, actor, ai_index in zip(entities, columns["name"].tolist(), actor_flags, ai.tolist()):
+            entity.name = name
+            if actor:
+                entity.fighter = Fighter.view(entity)
+                entity._ai = classes[ai_index](entity) if ai_index >= 0 else None
+    return entities
+
+
+def _read_entities(directory: str) -> Tuple[Dict[str, Any], List[Entity], Dict[str, np.ndarray]]:
+    """Read a save's meta.json and build its entities, which aren't on any map yet."""
+    with open(os.path.join(directory, "meta.json")) as fp:
+        meta = json.load(fp)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"Save format {meta['version']} isn't supported, expected {FORMAT_VERSION}")
+
+    with np.load(os.path.join(directory, "entities.npz")) as data:
+        columns = {name: data[name] for name in data.files}
+    return meta, unpack_entities(columns, meta["ai_classes"]), columns
+
+
+def _build_map(engine: Engine, directory: str, meta: Dict[str, Any], entities: List[Entity],
+               columns: Dict[str, np.ndarray], mmap: bool) -> GameMap:
+    compressed = os.path.join(directory, "map.npz")
+    if os.path.exists(compressed):
+        with np.load(compressed) as data:
+            arrays = {name: data[name] for name in MAP_ARRAYS}
+    else:
+        # Copy-on-write, so playing on doesn't touch the save
+        mmap_mode = "c" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in MAP_ARRAYS}
+
+    # Tile IDs go by the order tiles were registered in, which might have changed since the save
+    tile_ids = np.array([tile_types.registry.id(name) for name in meta["tile_names"]], dtype=tile_types.tile_id_dt)
+    tiles = arrays["tiles"]
+    if not np.array_equal(tile_ids, np.arange(len(tile_ids))):
+        tiles = np.asfortranarray(tile_ids[tiles])
+
+    game_map = GameMap(engine, meta["width"], meta["height"], tiles=tiles)
+    game_map.visible = arrays["visible"]
+    game_map.explored = arrays["explored"]
+    for entity in entities:
+        entity.gamemap = game_map
+    game_map.add_entities(entities, schedule=False)
+
+    # Put the timeline back the way it was, ties and all, so the game carries on exactly the same
+    game_map.scheduler.restore(meta["time"], (
+        (entity, next_turn, turn_order, dormant) for entity, next_turn, turn_order, dormant
+        in zip(entities, columns["next_turn"].tolist(), columns["turn_order"].tolist(), columns["dormant"].tolist())
+        if next_turn >= 0 or dormant))
+    return game_map
+
+
+def load_map(engine: Engine, directory: str, *, mmap: bool = True) -> GameMap:
+    """Load a floor written by save_map.
+
+    Args:
+        engine (Engine): Engine the floor belongs to
+        directory (str): Folder the floor was saved to
+        mmap (bool, optional): Memory-map the map arrays instead of reading them in.
+            Don't if the folder is going to be written to or deleted while the floor is in use. Defaults to True.
+
+    Raises:
+        ValueError: The save was made by a different version of the format
+
+    Returns:
+        GameMap: The floor, with its entities on it
+    """
+    return _build_map(engine, directory, *_read_entities(directory), mmap=mmap)
+
+
+def save_game(engine: Engine, directory: str) -> None:
+    """Write the current floor, its entities and the message log to a folder.
+
+    Args:
+        engine (Engine): Game to save
+        directory (str): Folder to write to. Made if it doesn't exist, and any older save in it gets replaced.
+    """
+    save_map(engine.game_map, directory, player=engine.player)
+
+    messages = engine.message_log
+    np.savez(os.path.join(directory, "messages.npz"),
+             text=np.array([message.plain_text for message in messages], dtype=np.str_),
+             fg=np.array([message.fg for message in messages], dtype=np.uint8).reshape(-1, 3),
+             count=np.array([message.count for message in messages], dtype=np.int32))
+
+
+def load_game(directory: str) -> Engine:
+    """Load a game written by save_game.
+
+    Args:
+        directory (str): Folder the game was saved to
+
+    Raises:
+        ValueError: The save was made by a different version of the format, or has no player
+
+    Returns:
+        Engine: New engine with the saved floor, player and message log. It has no level generator.
+    """
+    # The engine imports us (through World), so it has to be imported here
+    from engine import Engine
+
+    meta, entities, columns = _read_entities(directory)
+    player = meta["player"]
+    # A single floor saved with save_map has -1 here, and negative indices would happily pick someone else
+    if not 0 <= player < len(entities):
+        raise ValueError(f"The save has no player (entity {player} of {len(entities)})")
+    engine = Engine(player=entities[player])
+    engine.game_map = _build_map(engine, directory, meta, entities, columns, mmap=True)
+
+    with np.load(os.path.join(directory, "messages.npz")) as data:
+        for text, fg, count in zip(data["text"].tolist(), data["fg"].tolist(), data["count"].tolist()):
+            engine.message_log.add_message(text, tuple(fg), stack=False)
+            engine.message_log[-1].count = count
+
+    engine.update_fov()
+    return engine
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Iterable, List, Set, Tuple, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+
+if TYPE_CHECKING:
+    from entity import Actor
+    from game_map import GameMap
+
+# How long one action takes at normal speed (100)
+ACTION_COST = 100
+
+# How long something woken by a noise stays up before it can be parked again
+NOISE_WAKE_TIME = 10 * ACTION_COST
+
+
+def action_time(actor: Actor) -> int:
+    """How long one action takes this actor. Twice the speed is half the time.
+    Never 0, even for absurd speeds, otherwise time would stop and the actor would act forever."""
+    return max(1, ACTION_COST * 100 // max(1, actor.speed))
+
+
+class Scheduler:
+    """Timeline of when each actor on a map gets to act next, as a heap so only the ones
+    whose time has come get looked at.
+
+    Actors that can't do anything useful (e.g. monsters nobody can see) can be parked instead of
+    being woken up every turn for nothing. They stay parked until something wakes them:
+    coming into view (wake_in) or a noise nearby (noise). Noises also keep them up for a while
+    afterwards, see kept_awake.
+    """
+
+    def __init__(self, gamemap: GameMap) -> None:
+        self.gamemap = gamemap
+        # Current time. Goes up by the player's action time every turn.
+        self.time = 0
+        # [time, order, actor, still valid]. Entries are never taken out of the middle, just made invalid.
+        self._heap: List[list] = []
+        self._entries: Dict[Actor, list] = {}
+        # Breaks ties, so actors due at the same time go in the order they were scheduled
+        self._order = 0
+        self.dormant: Set[Actor] = set()
+
+    def __len__(self) -> int:
+        """Number of actors waiting for their turn, not counting parked ones."""
+        return len(self._entries)
+
+    def next_time(self, actor: Actor) -> int:
+        """When an actor acts next, or -1 if it isn't scheduled."""
+        entry = self._entries.get(actor)
+        return entry[0] if entry else -1
+
+    def order(self, actor: Actor) -> int:
+        """Tie breaker of an actor's next turn, or -1 if it isn't scheduled."""
+        entry = self._entries.get(actor)
+        return entry[1] if entry else -1
+
+    def schedule(self, actor: Actor, time: int, order: int = -1) -> None:
+        """Have an actor act at a time, instead of whenever it was going to.
+
+        Args:
+            actor (Actor): Actor to schedule
+            time (int): When it acts
+            order (int, optional): Tie breaker, only for putting back a saved schedule. Defaults to the next one.
+        """
+        self.remove(actor)
+        if order < 0:
+            order = self._order
+        self._order = max(self._order, order + 1)
+        entry = [time, order, actor, True]
+        self._entries[actor] = entry
+        heapq.heappush(self._heap, entry)
+
+    def add(self, actor: Actor) -> None:
+        """Add an actor that just arrived. It gets its first turn right away."""
+        self.schedule(actor, self.time)
+
+    def add_many(self, actors: Iterable[Actor]) -> None:
+        """Add a lot of actors that just arrived, faster than add one at a time."""
+        for actor in actors:
+            if actor in self._entries or actor in self.dormant:
+                self.remove(actor)
+            entry = [self.time, self._order, actor, True]
+            self._order += 1
+            self._entries[actor] = entry
+            self._heap.append(entry)
+        heapq.heapify(self._heap)
+
+    def restore(self, time: int, timeline: Iterable[Tuple[Actor, int, int, bool]]) -> None:
+        """Replace the whole timeline, e.g. with one from a save.
+
+        Args:
+            time (int): Current time
+            timeline (Iterable[Tuple[Actor, int, int, bool]]): For each actor: when it acts next
+                and its tie breaker (see next_time and order), and whether it's parked
+        """
+        self.time = time
+        self._heap = []
+        self._entries = {}
+        self.dormant = set()
+        for actor, next_time, order, dormant in timeline:
+            if dormant:
+                self.dormant.add(actor)
+            else:
+                entry = [next_time, order, actor, True]
+                self._entries[actor] = entry
+                self._heap.append(entry)
+                self._order = max(self._order, order + 1)
+        heapq.heapify(self._heap)
+
+    def remove(self, actor: Actor) -> None:
+        """Take an actor off the timeline, e.g. it died or left the map."""
+        entry = self._entries.pop(actor, None)
+        if entry:
+            entry[3] = False
+            # Don't let dead entries pile up when lots of actors get parked
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [item for item in self._heap if item[3]]
+                heapq.heapify(self._heap)
+        self.dormant.discard(actor)
+
+    def park(self, actor: Actor) -> None:
+        """Stop giving an actor turns until it gets woken up."""
+        self.remove(actor)
+        self.dormant.add(actor)
+
+    def wake(self, actor: Actor, duration: int = 0) -> None:
+        """Give a parked actor turns again, starting with the next one.
+
+        Args:
+            actor (Actor): Actor to wake
+            duration (int, optional): Keep it from being parked again for this long, see kept_awake. Defaults to 0.
+        """
+        if duration:
+            store, row = self.gamemap.store, actor.row
+            store.awake_until[row] = max(store.awake_until[row], self.time + duration)
+        if actor in self.dormant:
+            self.dormant.remove(actor)
+            self.schedule(actor, self.time)
+
+    def wake_in(self, mask: np.ndarray) -> None:
+        """Wake every parked actor on a True tile of a map-sized mask, e.g. `visible`."""
+        if self.dormant:
+            for actor in self.gamemap.store.living_actors_in(mask):
+                self.wake(actor)
+
+    def wake_near(self, x: int, y: int, radius: int, duration: int = 0) -> None:
+        """Wake every parked actor within radius (Chebyshev distance) of x,y.
+
+        Args:
+            duration (int, optional): Keep every actor in range (parked or not) from being parked
+                again for this long, see kept_awake. Defaults to 0.
+        """
+        if not self.dormant and not duration:
+            return
+        store = self.gamemap.store
+        rows = store.living_rows()
+        rows = rows[np.maximum(np.abs(store.x[rows] - x), np.abs(store.y[rows] - y)) <= radius]
+        if duration:
+            store.awake_until[rows] = np.maximum(store.awake_until[rows], self.time + duration)
+        if self.dormant:
+            for actor in store.entities[rows]:
+                self.wake(actor)
+
+    def noise(self, x: int, y: int, radius: int) -> None:
+        """Something loud happened at x,y. Everything within radius of it wakes up,
+        and stays up for NOISE_WAKE_TIME to come and have a look."""
+        self.wake_near(x, y, radius, NOISE_WAKE_TIME)
+
+    def kept_awake(self, rows: np.ndarray) -> np.ndarray:
+        """Which of these store rows were woken with a duration that hasn't run out yet.
+        Those can't be parked, even if they have nothing to do.
+
+        Args:
+            rows (np.ndarray): Rows in the map's store, or a single row
+
+        Returns:
+            np.ndarray: One bool per row
+        """
+        return self.gamemap.store.awake_until[rows] > self.time
+
+    def awake(self) -> List[Actor]:
+        """Every actor on the timeline, i.e. not parked."""
+        return list(self._entries)
+
+    def advance(self, duration: int) -> None:
+        """Move time forward."""
+        self.time += duration
+
+    def pop_due(self) -> List[Tuple[int, Actor]]:
+        """Take every actor whose turn has come off the timeline, in the order they act.
+        Schedule (or park) each of them again after their turn.
+
+        Returns:
+            List[Tuple[int, Actor]]: When each one was due, and the actor
+        """
+        heap = self._heap
+        due = []
+        while heap and heap[0][0] <= self.time:
+            time, _, actor, valid = heapq.heappop(heap)
+            if valid:
+                del self._entries[actor]
+                due.append((time, actor))
+        return due
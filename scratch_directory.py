@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import tempfile
+from typing import Optional
+
+
+class ScratchDirectory:
+    """A folder for things that got written out of memory, e.g. evicted floors or dropped chunks.
+
+    Either a folder that was given, or a temporary one that's only made the first time `path` is asked
+    for (so a game that never writes anything out never touches the disk) and deleted again by close.
+    """
+
+    def __init__(self, path: Optional[str] = None, prefix: str = "rldev-") -> None:
+        """
+        Args:
+            path (str, optional): Folder to use. Defaults to a temporary folder, deleted by close.
+            prefix (str, optional): Start of the temporary folder's name. Defaults to "rldev-".
+        """
+        self._path = path
+        self.prefix = prefix
+        self._temp_directory: Optional[tempfile.TemporaryDirectory] = None
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._temp_directory = tempfile.TemporaryDirectory(prefix=self.prefix)
+            self._path = self._temp_directory.name
+        return self._path
+
+    def close(self) -> None:
+        """Delete the temporary folder, if one was made. A folder that was given is left alone."""
+        if self._temp_directory is not None:
+            self._temp_directory.cleanup()
+            self._temp_directory = None
+            self._path = None
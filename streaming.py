@@ -0,0 +1,264 @@
+"""Maps too big to keep in memory, split into chunks that are made, loaded and dropped as the player moves.
+
+The game itself still plays on an ordinary GameMap: StreamingMap keeps one the size of a few chunks
+around the player and slides it over the world a chunk at a time. Everything that works on a GameMap
+(FOV, pathfinding, AI, rendering) works the same way, it just never sees the rest of the world.
+"""
+from __future__ import annotations
+
+import os
+import random
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import numpy as np  # type:ignore
+
+import entity_factories
+from entity_store import unplaced
+from game_map import GameMap
+from save_game import pack_entities, unpack_entities
+from scratch_directory import ScratchDirectory
+import tile_types
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from entity import Entity
+
+# Width and height of a chunk, in tiles
+CHUNK_SIZE = 32
+
+# Makes the chunk at a chunk position: its tiles, and the entities on it (not on any map, in world positions)
+ChunkGenerator = Callable[[int, int], Tuple[np.ndarray, List["Entity"]]]
+
+
+class Chunk:
+    __slots__ = ("tiles", "explored", "entities")
+
+    def __init__(self, tiles: np.ndarray, explored: np.ndarray, entities: List[Entity]) -> None:
+        self.tiles = tiles
+        self.explored = explored
+        # Entities waiting here while the chunk is away from the player, in world positions
+        self.entities = entities
+
+
+class ChunkStore:
+    """Every chunk of a world, keyed by chunk position, which can go on forever in any direction.
+
+    Chunks are generated the first time they're needed. Ones that aren't needed any more can be
+    dropped: their tiles and the entities waiting on them are written to disk (compressed, entities
+    as columns like in a save) and read back next time.
+    """
+
+    def __init__(self, generate: ChunkGenerator, directory: Optional[str] = None) -> None:
+        """
+        Args:
+            generate (ChunkGenerator): Makes new chunks
+            directory (str, optional): Where dropped chunks go. Defaults to a temporary folder, deleted on exit.
+        """
+        self.generate = generate
+        # Only made once something actually gets dropped
+        self._directory = ScratchDirectory(directory, prefix="rldev-chunks-")
+
+        self._chunks: Dict[Tuple[int, int], Chunk] = {}
+        # Chunks that are on disk
+        self._on_disk: Set[Tuple[int, int]] = set()
+
+        self.generated = 0
+        self.loaded = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        """Number of chunks in memory."""
+        return len(self._chunks)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(chunk.tiles.nbytes + chunk.explored.nbytes for chunk in self._chunks.values())
+
+    @property
+    def directory(self) -> str:
+        return self._directory.path
+
+    def _path(self, key: Tuple[int, int]) -> str:
+        return os.path.join(self.directory, f"{key[0]}_{key[1]}.npz")
+
+    def get(self, chunk_x: int, chunk_y: int) -> Chunk:
+        """Return a chunk, loading or generating it if it isn't in memory."""
+        key = chunk_x, chunk_y
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            return chunk
+
+        if key in self._on_disk:
+            with np.load(self._path(key)) as data:
+                columns = {name[len("entity."):]: data[name] for name in data.files if name.startswith("entity.")}
+                entities = unpack_entities(columns, data["ai_classes"].tolist())
+                chunk = Chunk(data["tiles"], data["explored"], entities)
+            os.remove(self._path(key))
+            self._on_disk.remove(key)
+            self.loaded += 1
+        else:
+            tiles, entities = self.generate(chunk_x, chunk_y)
+            chunk = Chunk(tiles, np.zeros((CHUNK_SIZE, CHUNK_SIZE), dtype=bool, order="F"), entities)
+            self.generated += 1
+        self._chunks[key] = chunk
+        return chunk
+
+    def drop(self, chunk_x: int, chunk_y: int) -> None:
+        """Write a chunk and its entities to disk and forget them."""
+        key = chunk_x, chunk_y
+        chunk = self._chunks.pop(key)
+        # Its entities aren't on a map, so their fields are in the unplaced store
+        rows = np.fromiter((entity.row for entity in chunk.entities), dtype=np.intp, count=len(chunk.entities))
+        columns, ai_classes = pack_entities(unplaced, rows, chunk.entities)
+        np.savez_compressed(self._path(key), tiles=chunk.tiles, explored=chunk.explored,
+                            ai_classes=np.array(ai_classes, dtype=np.str_),
+                            **{f"entity.{name}": column for name, column in columns.items()})
+        self._on_disk.add(key)
+        self.dropped += 1
+
+    def keep_only(self, keep: Iterable[Tuple[int, int]]) -> None:
+        """Drop every chunk in memory that isn't in `keep`."""
+        keep = set(keep)
+        for key in [key for key in self._chunks if key not in keep]:
+            self.drop(*key)
+
+    def close(self) -> None:
+        """Delete the temporary folder, if one was made. Dropped chunks are gone after this."""
+        self._directory.close()
+
+
+class StreamingMap:
+    """Plays a ChunkStore world through an ordinary GameMap.
+
+    The GameMap covers `active_chunks` x `active_chunks` chunks, with the player in the middle one.
+    When the player walks out of the middle chunk, it slides over by whole chunks: the tiles go back
+    to the store, entities that fall off the edge wait on their chunk, everything else is moved over,
+    and the new chunks are copied in. Chunks more than `keep_chunks` past the edge get dropped.
+
+    It's only a backend so far: the game in main.py still plays generated dungeon floors and never makes one.
+    To play on one, set Engine.streaming and Engine.game_map to it, like benchmarks/streaming.py does.
+    """
+
+    def __init__(self, engine: Engine, chunks: ChunkStore, active_chunks: int = 5, keep_chunks: int = 1) -> None:
+        """
+        Args:
+            engine (Engine): Engine the map belongs to
+            chunks (ChunkStore): The world
+            active_chunks (int, optional): Chunks across the GameMap, should be odd. Defaults to 5.
+            keep_chunks (int, optional): Chunks past the edge of the GameMap to keep in memory. Defaults to 1.
+        """
+        self.chunks = chunks
+        self.active_chunks = active_chunks
+        self.keep_chunks = keep_chunks
+
+        size = active_chunks * CHUNK_SIZE
+        self.game_map = GameMap(engine, size, size)
+        # Chunk position of the GameMap's top left chunk. World chunk 0,0 starts out in the middle.
+        self.origin = -(active_chunks // 2), -(active_chunks // 2)
+        # How many times the map slid over
+        self.shifts = 0
+        self._load()
+
+    def to_world(self, x: int, y: int) -> Tuple[int, int]:
+        """Turn a GameMap position into a world position."""
+        return x + self.origin[0] * CHUNK_SIZE, y + self.origin[1] * CHUNK_SIZE
+
+    def to_local(self, x: int, y: int) -> Tuple[int, int]:
+        """Turn a world position into a GameMap position. It might not be on the GameMap."""
+        return x - self.origin[0] * CHUNK_SIZE, y - self.origin[1] * CHUNK_SIZE
+
+    def _active(self) -> Iterable[Tuple[int, int, Tuple[slice, slice]]]:
+        """Each chunk on the GameMap: its chunk position and where it is on the GameMap."""
+        for i in range(self.active_chunks):
+            for j in range(self.active_chunks):
+                window = slice(i * CHUNK_SIZE, (i + 1) * CHUNK_SIZE), slice(j * CHUNK_SIZE, (j + 1) * CHUNK_SIZE)
+                yield self.origin[0] + i, self.origin[1] + j, window
+
+    def _store(self) -> None:
+        """Copy the GameMap's tiles back to the chunks, they might have changed."""
+        game_map = self.game_map
+        for chunk_x, chunk_y, window in self._active():
+            chunk = self.chunks.get(chunk_x, chunk_y)
+            chunk.tiles[:] = game_map.tiles[window]
+            chunk.explored[:] = game_map.explored[window]
+
+    def _load(self) -> None:
+        """Fill the GameMap from the chunks, along with any entities waiting on them."""
+        game_map = self.game_map
+        for chunk_x, chunk_y, window in self._active():
+            chunk = self.chunks.get(chunk_x, chunk_y)
+            game_map.tiles[window] = chunk.tiles
+            game_map.explored[window] = chunk.explored
+            for entity in chunk.entities:
+                entity.x, entity.y = self.to_local(entity.x, entity.y)
+                entity.gamemap = game_map
+                game_map.add_entity(entity)
+            chunk.entities = []
+        game_map.visible[:] = False
+        game_map.invalidate_tiles()
+        game_map.invalidate_fov()
+
+    def update(self, x: int, y: int) -> bool:
+        """Slide the GameMap over if x,y (the player, on the GameMap) isn't in the middle chunk any more.
+
+        Returns:
+            bool: True if it slid, and everything on it moved
+        """
+        middle = self.active_chunks // 2
+        shift_x, shift_y = x // CHUNK_SIZE - middle, y // CHUNK_SIZE - middle
+        if not shift_x and not shift_y:
+            return False
+
+        self._store()
+        game_map = self.game_map
+        dx, dy = shift_x * CHUNK_SIZE, shift_y * CHUNK_SIZE
+        for entity in list(game_map.entities):
+            new_x, new_y = entity.x - dx, entity.y - dy
+            if game_map.in_bounds(new_x, new_y):
+                continue
+            # Falls off the edge, so it waits on its chunk until the player comes back
+            game_map.remove_entity(entity)
+            entity.x, entity.y = self.to_world(entity.x, entity.y)
+            self.chunks.get(entity.x // CHUNK_SIZE, entity.y // CHUNK_SIZE).entities.append(entity)
+        for entity in list(game_map.entities):
+            game_map.move_entity(entity, entity.x - dx, entity.y - dy)
+
+        self.origin = self.origin[0] + shift_x, self.origin[1] + shift_y
+        self._load()
+        self.shifts += 1
+
+        # Everything more than keep_chunks past the edge can go
+        first_x, first_y = self.origin[0] - self.keep_chunks, self.origin[1] - self.keep_chunks
+        span = self.active_chunks + 2 * self.keep_chunks
+        self.chunks.keep_only((first_x + i, first_y + j) for i in range(span) for j in range(span))
+        return True
+
+
+def wilderness(seed: int, wall_chance: float = 0.15, monsters_per_chunk: int = 2) -> ChunkGenerator:
+    """An endless open world with scattered walls and monsters. The same seed and chunk always come out the same.
+
+    Args:
+        seed (int): Seed for the whole world
+        wall_chance (float, optional): Chance of any tile being a wall. Defaults to 0.15.
+        monsters_per_chunk (int, optional): Most monsters on a chunk. Defaults to 2.
+    """
+    def generate(chunk_x: int, chunk_y: int) -> Tuple[np.ndarray, List[Entity]]:
+        rng = np.random.default_rng((seed, chunk_x & 0xFFFFFFFF, chunk_y & 0xFFFFFFFF))
+        walls = rng.random((CHUNK_SIZE, CHUNK_SIZE)) < wall_chance
+        tiles = np.where(walls, tile_types.wall, tile_types.floor).astype(tile_types.tile_id_dt, order="F")
+
+        entities: List[Entity] = []
+        occupied: Set[Tuple[int, int]] = set()
+        spawn_rng = random.Random(int(rng.integers(2**32)))
+        for _ in range(spawn_rng.randint(0, monsters_per_chunk)):
+            x, y = spawn_rng.randrange(CHUNK_SIZE), spawn_rng.randrange(CHUNK_SIZE)
+            if walls[x, y] or (x, y) in occupied:
+                continue
+            occupied.add((x, y))
+            template = entity_factories.orc if spawn_rng.random() < 0.8 else entity_factories.troll
+            monster = template.clone()
+            monster.x, monster.y = chunk_x * CHUNK_SIZE + x, chunk_y * CHUNK_SIZE + y
+            entities.append(monster)
+        return tiles, entities
+
+    return generate
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Monsters sleeping out of view, and waking up again. Run with `python -m pytest`."""
+import numpy as np  # type:ignore
+
+from actions import WaitAction
+from engine import Engine
+import entity_factories
+from game_map import GameMap
+from headless import Simulation
+import tile_types
+
+
+def new_game() -> Engine:
+    """A long empty room, with the player at the west end and an orc way out of view at the east end."""
+    engine = Engine(player=entity_factories.player.clone())
+    tiles = np.full((60, 5), fill_value=tile_types.wall, dtype=tile_types.tile_id_dt, order="F")
+    tiles[1:-1, 1:-1] = tile_types.floor
+    engine.game_map = GameMap(engine, 60, 5, tiles=tiles)
+    engine.player.place(2, 2, engine.game_map)
+    entity_factories.orc.spawn(engine.game_map, 50, 2)
+    engine.update_fov()
+    return engine
+
+
+def orc_of(engine: Engine):
+    return next(actor for actor in engine.game_map.actors if actor is not engine.player)
+
+
+def wait_turns(engine: Engine, turns: int) -> None:
+    for _ in range(turns):
+        WaitAction(engine.player).perform()
+        engine.handle_enemy_turns()
+        engine.update_fov()
+
+
+def test_out_of_view_monster_sleeps() -> None:
+    engine = new_game()
+    orc = orc_of(engine)
+    assert orc in engine.game_map.scheduler.dormant
+    wait_turns(engine, 5)
+    assert (orc.x, orc.y) == (50, 2)
+
+
+def test_noise_woken_monster_stays_up() -> None:
+    engine = new_game()
+    orc = orc_of(engine)
+    engine.game_map.scheduler.noise(48, 2, radius=4)
+    assert orc not in engine.game_map.scheduler.dormant
+
+    wait_turns(engine, 5)
+    # It didn't get parked again straight away, but it still can't see the player so it waits
+    assert orc not in engine.game_map.scheduler.dormant
+    assert (orc.x, orc.y) == (50, 2)
+
+
+def test_sleeping_changes_nothing() -> None:
+    """Parking monsters is only about not asking them, a game plays out the same as with everyone awake."""
+    def play(activity_radius: int):
+        sim = Simulation(seed=3, max_monsters_per_room=4)
+        sim.engine.activity_radius = activity_radius
+        sim.engine.update_activity()
+        fighter = sim.engine.player.fighter
+        fighter.max_hp = fighter.hp = 1_000_000
+        for _ in range(300):
+            sim.step()
+        return sorted((actor.x, actor.y, actor.fighter.hp) for actor in sim.engine.game_map.actors)
+
+    assert play(0) == play(10_000)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Enemy turns taken in one batch against one monster at a time. Run with `python -m pytest`."""
+import numpy as np  # type:ignore
+
+from engine import Engine
+import entity_factories
+from game_map import GameMap
+import tile_types
+
+
+def new_game(batch: bool) -> Engine:
+    """A room with the player in a corner, an orc next to them, a few further off and one behind a wall."""
+    engine = Engine(player=entity_factories.player.clone())
+    engine.batch_enemy_turns = batch
+    tiles = np.full((30, 12), fill_value=tile_types.wall, dtype=tile_types.tile_id_dt, order="F")
+    tiles[1:20, 1:-1] = tile_types.floor
+    tiles[21:-1, 1:-1] = tile_types.floor
+    engine.game_map = GameMap(engine, 30, 12, tiles=tiles)
+    engine.player.place(2, 2, engine.game_map)
+    fighter = engine.player.fighter
+    fighter.max_hp = fighter.hp = 1000
+    for x, y in ((3, 3), (9, 2), (9, 8), (15, 5), (25, 5)):
+        entity_factories.orc.spawn(engine.game_map, x, y)
+    engine.update_fov()
+    return engine
+
+
+def play(engine: Engine, turns: int):
+    for _ in range(turns):
+        engine.handle_enemy_turns()
+        engine.update_fov()
+    return engine.player.fighter.hp, sorted((actor.x, actor.y) for actor in engine.game_map.actors)
+
+
+def test_batch_does_what_perform_does() -> None:
+    batched, one_by_one = new_game(batch=True), new_game(batch=False)
+    # Until they start crowding round the player, where the batch moves everyone from where they started the turn
+    for _ in range(4):
+        assert play(batched, 1) == play(one_by_one, 1)
+
+    hp, positions = play(batched, 0)
+    # The one next to the player hit them every turn, the one behind the wall never saw them
+    assert hp < 1000
+    assert (25, 5) in positions
+    assert (9, 2) not in positions
+
+
+def test_batch_never_stacks_monsters() -> None:
+    engine = new_game(batch=True)
+    for _ in range(15):
+        _, positions = play(engine, 1)
+        assert len(set(positions)) == len(positions)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""The FOV cache: computing only when something changed, and coming back to the same result. Run with `python -m pytest`."""
+import numpy as np  # type:ignore
+
+from engine import Engine
+import entity_factories
+from fov import FovCache
+from game_map import GameMap
+import tile_types
+
+
+def new_map() -> GameMap:
+    """An empty room with a wall across it at x=10."""
+    engine = Engine(player=entity_factories.player.clone())
+    tiles = np.full((30, 20), fill_value=tile_types.wall, dtype=tile_types.tile_id_dt, order="F")
+    tiles[1:-1, 1:-1] = tile_types.floor
+    tiles[10, :] = tile_types.wall
+    return GameMap(engine, 30, 20, tiles=tiles)
+
+
+def test_nothing_changed_nothing_computed() -> None:
+    game_map, fov = new_map(), FovCache(radius=8)
+    assert fov.update(game_map, 5, 5)
+    assert not fov.update(game_map, 5, 5)
+    assert fov.misses == 1
+
+
+def test_changed_tiles_are_seen_through() -> None:
+    game_map, fov = new_map(), FovCache(radius=8)
+    fov.update(game_map, 8, 5)
+    assert not game_map.visible[12, 5]
+
+    # Knock a hole in the wall, the old result mustn't be used any more
+    game_map.tiles[10, 5] = tile_types.floor
+    game_map.invalidate_tiles()
+    assert fov.update(game_map, 8, 5)
+    assert fov.misses == 2
+    assert game_map.visible[12, 5]
+
+
+def test_walking_back_comes_out_of_the_cache() -> None:
+    game_map, fov = new_map(), FovCache(radius=8)
+    fov.update(game_map, 5, 5)
+    first = game_map.visible.copy()
+    fov.update(game_map, 6, 5)
+    assert fov.update(game_map, 5, 5)
+    assert (fov.hits, fov.misses) == (1, 2)
+    assert np.array_equal(game_map.visible, first)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Cutting down the events of a frame before they get handled. Run with `python -m pytest`."""
+import tcod
+
+from input_handlers import coalesce_events
+
+
+def key(sym: tcod.event.KeySym, repeat: bool = False) -> tcod.event.KeyDown:
+    return tcod.event.KeyDown(scancode=tcod.event.Scancode.UNKNOWN, sym=sym, mod=tcod.event.Modifier.NONE, repeat=repeat)
+
+
+def motion(x: int, y: int) -> tcod.event.MouseMotion:
+    return tcod.event.MouseMotion(position=(x, y))
+
+
+def test_only_last_mouse_motion_kept() -> None:
+    up = key(tcod.event.KeySym.UP)
+    last = motion(3, 3)
+    events = [motion(1, 1), up, motion(2, 2), last]
+    assert coalesce_events(events) == [up, last]
+
+
+def test_key_repeats_capped_per_key() -> None:
+    press = key(tcod.event.KeySym.UP)
+    up_repeats = [key(tcod.event.KeySym.UP, repeat=True) for _ in range(5)]
+    left_repeat = key(tcod.event.KeySym.LEFT, repeat=True)
+    events = [press, *up_repeats, left_repeat]
+
+    assert coalesce_events(events) == events
+    assert coalesce_events(events, max_key_repeats=2) == [press, *up_repeats[:2], left_repeat]
+    # A fresh press isn't a repeat, so it always gets through
+    assert coalesce_events([press, press, press], max_key_repeats=0) == [press, press, press]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Recording games to a journal and playing them back. Run with `python -m pytest`."""
+import pytest
+
+from actions import BumpAction, MovementAction, WaitAction
+from engine import Engine
+import entity_factories
+from headless import Simulation
+from journal import Journal, JournalHeader, Replay, decode_action, read_journal
+
+HEADER = JournalHeader(seed=2, map_width=80, map_height=43, max_rooms=30,
+                       room_min_size=6, room_max_size=10, max_monsters_per_room=2)
+
+
+def fingerprint(sim: Simulation):
+    return sorted((entity.name, entity.x, entity.y, getattr(getattr(entity, "fighter", None), "hp", 0))
+                  for entity in sim.engine.game_map.entities)
+
+
+def record(path: str, turns: int) -> Simulation:
+    sim = Simulation(map_width=HEADER.map_width, map_height=HEADER.map_height, max_rooms=HEADER.max_rooms,
+                     room_min_size=HEADER.room_min_size, room_max_size=HEADER.room_max_size,
+                     max_monsters_per_room=HEADER.max_monsters_per_room, seed=HEADER.seed)
+    sim.engine.journal = Journal(path, HEADER)
+    sim.run(turns, render=False)
+    sim.engine.journal.close()
+    return sim
+
+
+def test_actions_come_back_the_same(tmp_path) -> None:
+    path = str(tmp_path / "game.journal")
+    player = Engine(player=entity_factories.player.clone()).player
+    actions = [WaitAction(player), BumpAction(player, -1, 1), MovementAction(player, 1, -1)]
+    journal = Journal(path, HEADER)
+    for action in actions:
+        journal.record(action)
+    journal.close()
+
+    header, records = read_journal(path)
+    assert header == HEADER
+    decoded = [decode_action(record, player) for record in records]
+    assert [type(action) for action in decoded] == [type(action) for action in actions]
+    assert [(action.dx, action.dy) for action in decoded[1:]] == [(-1, 1), (1, -1)]
+
+
+def test_not_a_journal(tmp_path) -> None:
+    path = tmp_path / "nonsense"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        read_journal(str(path))
+
+
+def test_replay_ends_up_where_the_game_did(tmp_path) -> None:
+    path = str(tmp_path / "game.journal")
+    sim = record(path, 300)
+    assert sim.engine.player.is_alive
+    replay = Replay(path, snapshot_every=100, snapshot_directory=str(tmp_path / "snapshots"))
+    assert fingerprint(replay.seek()) == fingerprint(sim)
+    assert replay.snapshots == [100, 200, 300]
+
+
+def test_seek_through_snapshots_matches_playing_from_the_start(tmp_path) -> None:
+    path = str(tmp_path / "game.journal")
+    record(path, 300)
+    replay = Replay(path, snapshot_every=100, snapshot_directory=str(tmp_path / "snapshots"))
+    replay.seek()
+    # Backwards, so these come from a snapshot instead of from where the replay already is
+    for turn in (250, 120):
+        from_snapshot = replay.seek(turn)
+        assert from_snapshot.turns == turn
+        assert fingerprint(from_snapshot) == fingerprint(Replay(path, snapshot_every=0).seek(turn))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""The message log's ring buffer, and spilling old messages to a file. Run with `python -m pytest`."""
+import json
+
+import pytest
+
+import color
+from message_log import MessageLog
+
+
+def texts(log: MessageLog):
+    return [message.plain_text for message in log]
+
+
+def test_oldest_go_first_when_full() -> None:
+    log = MessageLog(capacity=3)
+    for i in range(5):
+        log.add_message(f"message {i}")
+    assert len(log) == 3
+    assert texts(log) == ["message 2", "message 3", "message 4"]
+    assert log[0].plain_text == "message 2"
+    assert log[-1].plain_text == "message 4"
+    assert log.spilled == 2
+    with pytest.raises(IndexError):
+        log[3]
+
+
+def test_stacking_across_the_wrap() -> None:
+    log = MessageLog(capacity=2)
+    for text in ("a", "b", "c", "c"):
+        log.add_message(text)
+    assert texts(log) == ["b", "c"]
+    assert log[-1].count == 2
+
+
+def test_spill_to_file(tmp_path) -> None:
+    path = tmp_path / "messages.jsonl"
+    log = MessageLog(capacity=2, spill_path=str(path))
+    log.add_message("first", color.white)
+    log.add_message("first", color.white)
+    log.add_message("second")
+    log.add_message("third")
+    log.add_message("fourth")
+    log.close()
+
+    spilled = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(line["text"], line["count"]) for line in spilled] == [("first", 2), ("second", 1)]
+    assert tuple(spilled[0]["fg"]) == color.white
+    assert texts(log) == ["third", "fourth"]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Saving and loading floors and games. Run with `python -m pytest`."""
+import json
+import os
+
+import numpy as np  # type:ignore
+import pytest
+
+from entity_store import unplaced
+from headless import Simulation
+from save_game import load_game, load_map, save_game, save_map
+
+
+def test_save_and_load_game(tmp_path) -> None:
+    sim = Simulation(seed=1, max_monsters_per_room=4)
+    for _ in range(20):
+        sim.step()
+    engine = sim.engine
+    directory = str(tmp_path / "game")
+    save_game(engine, directory)
+
+    loaded = load_game(directory)
+    assert (loaded.player.x, loaded.player.y) == (engine.player.x, engine.player.y)
+    assert loaded.player.fighter.hp == engine.player.fighter.hp
+    assert loaded.player in loaded.game_map.entities
+    assert np.array_equal(loaded.game_map.tiles, engine.game_map.tiles)
+    assert np.array_equal(loaded.game_map.explored, engine.game_map.explored)
+
+    def actors(game_map):
+        return sorted((actor.x, actor.y, actor.name, actor.fighter.hp, type(actor.ai).__name__)
+                      for actor in game_map.actors)
+    assert actors(loaded.game_map) == actors(engine.game_map)
+    assert [(m.plain_text, m.count) for m in loaded.message_log] == [(m.plain_text, m.count) for m in engine.message_log]
+
+
+def test_load_game_without_player(tmp_path) -> None:
+    sim = Simulation(seed=1)
+    directory = str(tmp_path / "game")
+    save_game(sim.engine, directory)
+
+    meta_path = os.path.join(directory, "meta.json")
+    with open(meta_path) as fp:
+        meta = json.load(fp)
+    for player in (-1, len(sim.engine.game_map.entities)):
+        meta["player"] = player
+        with open(meta_path, "w") as fp:
+            json.dump(meta, fp)
+        with pytest.raises(ValueError):
+            load_game(directory)
+
+
+def test_loading_again_and_again_reuses_rows(tmp_path) -> None:
+    sim = Simulation(seed=1, max_monsters_per_room=4)
+    directory = str(tmp_path / "floor")
+    save_map(sim.engine.game_map, directory)
+
+    # Entities pass through the unplaced store on the way onto the map, their rows have to be handed back
+    load_map(sim.engine, directory)
+    size = unplaced.size
+    for _ in range(10):
+        game_map = load_map(sim.engine, directory)
+        assert len(list(game_map.actors)) == len(list(sim.engine.game_map.actors))
+    assert unplaced.size == size
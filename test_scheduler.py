@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Who acts when, with actors being parked, woken and removed. Run with `python -m pytest`."""
+import numpy as np  # type:ignore
+
+from engine import Engine
+import entity_factories
+from game_map import GameMap
+from scheduler import ACTION_COST, NOISE_WAKE_TIME, Scheduler
+
+
+def new_scheduler():
+    """A scheduler with nothing on it, and three orcs in a row that aren't scheduled yet."""
+    engine = Engine(player=entity_factories.player.clone())
+    game_map = GameMap(engine, 20, 5)
+    orcs = [entity_factories.orc.spawn(game_map, x, 2) for x in (5, 10, 15)]
+    scheduler = game_map.scheduler
+    scheduler.restore(0, [])
+    return scheduler, orcs
+
+
+def due(scheduler: Scheduler):
+    return [actor for _, actor in scheduler.pop_due()]
+
+
+def test_earliest_first_ties_in_scheduling_order() -> None:
+    scheduler, (a, b, c) = new_scheduler()
+    scheduler.schedule(a, 2 * ACTION_COST)
+    scheduler.schedule(b, ACTION_COST)
+    scheduler.schedule(c, ACTION_COST)
+    assert due(scheduler) == []
+
+    scheduler.advance(ACTION_COST)
+    assert due(scheduler) == [b, c]
+    scheduler.advance(ACTION_COST)
+    assert due(scheduler) == [a]
+    assert len(scheduler) == 0
+
+
+def test_rescheduling_replaces_the_old_turn() -> None:
+    scheduler, (a, b, _) = new_scheduler()
+    scheduler.add(a)
+    scheduler.add(b)
+    scheduler.schedule(a, ACTION_COST)
+    assert due(scheduler) == [b]
+    scheduler.advance(ACTION_COST)
+    assert due(scheduler) == [a]
+
+
+def test_parked_and_removed_actors_get_no_turns() -> None:
+    scheduler, (a, b, c) = new_scheduler()
+    scheduler.add_many([a, b, c])
+    scheduler.park(b)
+    scheduler.remove(c)
+    assert b in scheduler.dormant
+    assert len(scheduler) == 1
+    assert due(scheduler) == [a]
+
+    # Woken up, it's back on the timeline and acts on the next turn
+    scheduler.advance(ACTION_COST)
+    scheduler.wake(b)
+    assert b not in scheduler.dormant
+    assert due(scheduler) == [b]
+
+
+def test_noise_wakes_and_keeps_awake_what_is_in_range() -> None:
+    scheduler, (a, b, c) = new_scheduler()
+    for orc in (a, b, c):
+        scheduler.park(orc)
+    scheduler.noise(6, 2, radius=3)
+    assert scheduler.dormant == {b, c}
+    rows = np.array([a.row, b.row, c.row])
+    assert scheduler.kept_awake(rows).tolist() == [True, False, False]
+
+    scheduler.advance(NOISE_WAKE_TIME)
+    assert not scheduler.kept_awake(rows).any()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""Chunks of a streaming world going to disk and coming back. Run with `python -m pytest`."""
+from streaming import ChunkStore, wilderness
+
+
+def describe(chunk):
+    return sorted((entity.name, entity.x, entity.y, entity.fighter.hp, entity.is_alive) for entity in chunk.entities)
+
+
+def test_dropped_chunk_comes_back_with_its_entities() -> None:
+    chunks = ChunkStore(wilderness(seed=1, monsters_per_chunk=5))
+    try:
+        chunk = chunks.get(3, -2)
+        assert chunk.entities
+        chunk.entities[0].fighter.hp -= 1
+        tiles, before = chunk.tiles.copy(), describe(chunk)
+
+        chunks.drop(3, -2)
+        assert len(chunks) == 0
+        chunk = chunks.get(3, -2)
+        assert chunks.loaded == 1
+        assert (chunk.tiles == tiles).all()
+        assert describe(chunk) == before
+    finally:
+        chunks.close()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Changing floors, with old floors evicted to disk and loaded back. Run with `python -m pytest`."""
+import os
+import random
+
+from engine import Engine
+import entity_factories
+from procgen import LevelPregenerator
+from world import World
+
+
+def new_game() -> Engine:
+    random.seed(1)
+    engine = Engine(player=entity_factories.player.clone())
+    # Only the floor the player is on stays in memory
+    engine.world = World(engine, max_resident=1)
+    engine.level_generator = LevelPregenerator(engine, 30, 6, 10, 2, 80, 43)
+    engine.next_floor()
+    return engine
+
+
+def test_go_back_to_evicted_floor() -> None:
+    engine = new_game()
+    try:
+        first = engine.game_map
+        start = engine.player.x, engine.player.y
+        monsters = len(list(first.actors)) - 1
+        engine.handle_enemy_turns()
+
+        engine.next_floor()
+        assert not engine.world.is_resident(0)
+        # Made for the floor that just got evicted, close has to clean it up
+        directory = engine.world.directory
+        # The flow field mustn't hang on to the floor that was just evicted
+        assert engine.flow_field.distance is None
+
+        engine.go_to_floor(0)
+        assert engine.world.reloads == 1
+        assert engine.game_map is not first
+        assert (engine.player.x, engine.player.y) == start
+        assert len(list(engine.game_map.actors)) - 1 == monsters
+        assert engine.player in engine.game_map.entities
+    finally:
+        engine.level_generator.shutdown()
+        engine.world.close()
+    assert not os.path.exists(directory)
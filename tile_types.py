@@ -1,4 +1,4 @@
-from typing import Tuple
+from typing import Dict, List, Tuple
 import numpy as np  # type: ignore (not sure what this means)
 
 # Tile graphics structured type compatible with Console.tiles_rgb.
@@ -20,17 +20,70 @@ tile_dt = np.dtype(
     ]
 )
 
+# Maps store one of these per tile, an index into the registry
+tile_id_dt = np.dtype(np.uint8)
 
-def new_tile(*, walkable: int, transparent: int, dark: Tuple[int, Tuple[int, int, int], Tuple[int, int, int]], light: Tuple[int, Tuple[int, int, int], Tuple[int, int, int]]) -> np.ndarray:
-    return np.array((walkable, transparent, dark, light), dtype=tile_dt)
+# Rows of TileRegistry.graphics
+SHROUDED, DARK, LIGHT = 0, 1, 2
 
 
-# Tile factory
-floor = new_tile(walkable=True, transparent=True, dark=(
-    ord(" "), (255, 255, 255), (50, 50, 150)), light=(ord(" "), (255, 255, 255), (200, 180, 50)),)
-wall = new_tile(walkable=False, transparent=False, dark=(
-    ord(" "), (255, 255, 255), (0, 0, 100)), light=(ord(" "), (255, 255, 255), (130, 110, 50)),)
+def new_tile(*, walkable: int, transparent: int, dark: Tuple[int, Tuple[int, int, int], Tuple[int, int, int]], light: Tuple[int, Tuple[int, int, int], Tuple[int, int, int]]) -> np.ndarray:
+    return np.array((walkable, transparent, dark, light), dtype=tile_dt)
 
 
 # SHROUD reprsents unexplored, unseen tiles
 SHROUD = np.array((ord(" "), (255, 255, 255), (0, 0, 0)), dtype=graphic_dt)
+
+
+class TileRegistry:
+    """Every kind of tile there is. Maps only store a tile ID per tile (1 byte instead of a whole tile_dt),
+    and look up what it means in the arrays here, e.g. `registry.walkable[game_map.tiles]`.
+    """
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self.tiles = np.zeros(0, dtype=tile_dt)
+        self._update()
+
+    def register(self, name: str, tile: np.ndarray) -> int:
+        """Add a kind of tile.
+
+        Args:
+            name (str): Unique name, it's what saves remember the tile by
+            tile (np.ndarray): The tile, see new_tile
+
+        Returns:
+            int: Its tile ID
+        """
+        if name in self._ids:
+            raise ValueError(f"There's already a tile called {name}")
+        if len(self.names) > np.iinfo(tile_id_dt).max:
+            raise ValueError("No tile IDs left")
+        self._ids[name] = len(self.names)
+        self.names.append(name)
+        self.tiles = np.append(self.tiles, tile)
+        self._update()
+        return self._ids[name]
+
+    def id(self, name: str) -> int:
+        """The tile ID of a tile name."""
+        return self._ids[name]
+
+    def _update(self) -> None:
+        # Lookup tables, indexed by tile ID
+        self.walkable = self.tiles["walkable"]
+        self.transparent = self.tiles["transparent"]
+        self.dark = self.tiles["dark"]
+        self.light = self.tiles["light"]
+        # Indexed with [SHROUDED/DARK/LIGHT, tile ID], so drawing a map is one lookup
+        self.graphics = np.stack([np.full(len(self.tiles), SHROUD, dtype=graphic_dt), self.dark, self.light])
+
+
+registry = TileRegistry()
+
+# Tile factory. Walls go first so a map of zeros is solid rock.
+wall = registry.register("wall", new_tile(walkable=False, transparent=False, dark=(
+    ord(" "), (255, 255, 255), (0, 0, 100)), light=(ord(" "), (255, 255, 255), (130, 110, 50)),))
+floor = registry.register("floor", new_tile(walkable=True, transparent=True, dark=(
+    ord(" "), (255, 255, 255), (50, 50, 150)), light=(ord(" "), (255, 255, 255), (200, 180, 50)),))
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+import os
+import shutil
+import time
+from typing import Deque, Dict, Optional, Tuple, TYPE_CHECKING
+
+from save_game import load_map, save_map
+from scratch_directory import ScratchDirectory
+
+if TYPE_CHECKING:
+    from engine import Engine
+    from game_map import GameMap
+
+
+class World:
+    """Every floor visited so far, by depth. Only the most recently visited ones stay in memory.
+
+    Once there are more than `max_resident` floors in memory, or they add up to more than
+    `memory_budget` bytes, the least recently visited get written to disk and dropped.
+    They're loaded back when the player goes there again. The floor the player is on never leaves.
+
+    There are no stairs yet, so in the game only Engine.next_floor (adding floors) gets used.
+    Going back up with Engine.go_to_floor, and so reloading evicted floors, is covered by test_world.py.
+    Call close when the game ends.
+    """
+
+    def __init__(self, engine: Engine, max_resident: int = 3, memory_budget: int = 256 * 2**20,
+                 directory: Optional[str] = None, compress: bool = True) -> None:
+        """
+        Args:
+            engine (Engine): Engine the floors belong to
+            max_resident (int, optional): Most floors to keep in memory. Defaults to 3.
+            memory_budget (int, optional): Most bytes of floors to keep in memory. Defaults to 256MB.
+            directory (str, optional): Where evicted floors go. Defaults to a temporary folder, deleted on exit.
+            compress (bool, optional): Compress evicted floors. Defaults to True.
+        """
+        self.engine = engine
+        self.max_resident = max_resident
+        self.memory_budget = memory_budget
+        self.compress = compress
+        # Only made once something actually gets evicted
+        self._directory = ScratchDirectory(directory, prefix="rldev-floors-")
+
+        # Depth of the floor the player is on
+        self.current: Optional[int] = None
+        self.depth_count = 0
+        # Floors in memory, least recently visited first
+        self._resident: OrderedDict[int, GameMap] = OrderedDict()
+        self._sizes: Dict[int, int] = {}
+        # Where the player was standing when they left each floor
+        self._player_positions: Dict[int, Tuple[int, int]] = {}
+
+        self.evictions = 0
+        self.reloads = 0
+        # How long the most recent reloads took, in seconds
+        self.reload_times: Deque[float] = deque(maxlen=100)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @property
+    def resident_count(self) -> int:
+        return len(self._resident)
+
+    @property
+    def mean_reload_time(self) -> float:
+        return sum(self.reload_times) / len(self.reload_times) if self.reload_times else 0.0
+
+    @property
+    def directory(self) -> str:
+        return self._directory.path
+
+    def _floor_directory(self, depth: int) -> str:
+        return os.path.join(self.directory, f"floor{depth}")
+
+    def is_resident(self, depth: int) -> bool:
+        return depth in self._resident
+
+    def leave(self) -> None:
+        """Remember where the player is on the current floor, so they come back to the same spot.
+        Call before the player gets moved off it."""
+        if self.current is not None:
+            player = self.engine.player
+            self._player_positions[self.current] = player.x, player.y
+
+    def add(self, game_map: GameMap) -> int:
+        """Add a brand new floor below the others and make it the current one.
+        The player should already be on it.
+
+        Returns:
+            int: Depth of the floor
+        """
+        depth = self.depth_count
+        self.depth_count += 1
+        self.current = depth
+        self._resident[depth] = game_map
+        self._sizes[depth] = game_map.nbytes
+        self._evict()
+        return depth
+
+    def enter(self, depth: int) -> GameMap:
+        """Move the player to a floor they've been on before, loading it from disk if it was evicted.
+
+        Args:
+            depth (int): Depth of the floor
+
+        Returns:
+            GameMap: The floor, with the player where they were when they left it
+        """
+        if not 0 <= depth < self.depth_count:
+            raise IndexError(f"There's no floor {depth}")
+        self.leave()
+
+        game_map = self._resident.get(depth)
+        if game_map is None:
+            game_map = self._reload(depth)
+            self._resident[depth] = game_map
+            self._sizes[depth] = game_map.nbytes
+        else:
+            self._resident.move_to_end(depth)
+
+        self.current = depth
+        self.engine.player.place(*self._player_positions[depth], game_map)
+        self._evict()
+        return game_map
+
+    def _reload(self, depth: int) -> GameMap:
+        start = time.perf_counter()
+        directory = self._floor_directory(depth)
+        # Read in full, so the files can go straight away
+        game_map = load_map(self.engine, directory, mmap=False)
+        shutil.rmtree(directory)
+        duration = time.perf_counter() - start
+
+        self.reloads += 1
+        self.reload_times.append(duration)
+        if self.engine.profiler.enabled:
+            self.engine.profiler.record(("world.reload",), start, duration)
+        return game_map
+
+    def _evict(self) -> None:
+        """Write out the least recently visited floors until we're within budget."""
+        while len(self._resident) > 1 and (len(self._resident) > self.max_resident
+                                           or self.resident_bytes > self.memory_budget):
+            depth = next(iter(self._resident))
+            if depth == self.current:
+                # Always the most recent, but just in case
+                self._resident.move_to_end(depth)
+                continue
+            game_map = self._resident.pop(depth)
+            del self._sizes[depth]
+            save_map(game_map, self._floor_directory(depth), compress=self.compress)
+            self.evictions += 1
+
+    def close(self) -> None:
+        """Delete the temporary folder, if one was made. Evicted floors are gone after this."""
+        self._directory.close()